@@ -1,6 +1,5 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import pandas as pd
 import uuid
 import time
 from datetime import datetime
@@ -13,17 +12,12 @@ import time
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 from src.getData import (
-    load_and_save_normalized, 
-    save_idea_recommendation, 
-    save_campaign_recommendation,
+    RecommendationWriter,
     supabase
 )
-from src.preprocessing import preprocess_dataframe
-from src.matching import filter_candidates_by_type
-from src.ruledBased import rule_based_match_improved
-from src.similarity import build_similarity_engine
-from src.ranking import combine_scores_improved
-from src.utils import normalize_tags
+from src.matching import MatchRequest, flush_recommendations, format_matches, match_challenges
+from src.snapshotStore import snapshot_store
+from src.retrieval import RETRIEVAL_TOP_K
 
 app = Flask(__name__)
 CORS(app)
@@ -74,6 +68,63 @@ def health_check():
         "service": "recommendation-engine"
     })
 
+def run_match_request(body: Dict[str, Any], entity_types, engagement_fields):
+    """
+    Shared pipeline for the /matches* routes: body -> MatchRequest, current snapshot,
+    matching core, buffered DB writes. Return (results, summary, error_response);
+    summary = challenges_processed + hasil DB write (lihat flush_recommendations).
+    """
+    ideas_url = body.get("ideas_url", IDEAS_URL)
+    campaigns_url = body.get("campaigns_url", CAMPAIGNS_URL)
+    challenges_url = body.get("challenges_url", CHALLENGES_URL)
+    
+    # Parameters
+    challenge_id = body.get("challenge_id")
+    save_to_db = body.get("save_to_db", True)
+    match_request = MatchRequest(
+        entity_types=entity_types,
+        limit=body.get("limit", 10),
+        min_score=body.get("min_score", 0.1),
+        engagement_fields=engagement_fields,
+        exhaustive=body.get("exhaustive", False),
+        shortlist_size=body.get("shortlist_size", RETRIEVAL_TOP_K),
+        # Serial di request thread: tidak fork per request (process API punya refresher thread);
+        # worker pool hanya untuk batch CLI (src/main.py)
+        workers=1,
+    )
+    
+    # Preprocessed data + similarity engine from the in-memory snapshot ("refresh": true re-ingests first)
+    if body.get("refresh", False):
+        snapshot = snapshot_store.refresh(ideas_url, campaigns_url, challenges_url)
+    else:
+        snapshot = snapshot_store.get(ideas_url, campaigns_url, challenges_url)
+    challenges, engine = snapshot.challenges, snapshot.engine
+    
+    # Single challenge: snapshot row, or challenge + conditions from DB if it is newer than the snapshot
+    if challenge_id:
+        if not is_valid_uuid(challenge_id):
+            return None, None, (jsonify({"error": "Invalid challenge_id format"}), 400)
+        challenges, engine = snapshot.challenge(challenge_id)
+        if challenges.empty:
+            # Tabel challenges hanya diisi ingestion; challenge yang dibuat upstream setelah
+            # ingestion terakhir ada setelah refresh. 404 langsung, refresh (rate-limited) di background
+            snapshot_store.schedule_refresh(*snapshot.sources)
+            return None, None, (jsonify({"error": "Challenge not found"}), 404)
+    
+    writer = RecommendationWriter() if save_to_db else None
+    try:
+        results = match_challenges(
+            match_request, challenges, snapshot.views, engine,
+            text_index=snapshot.text_index, index_cache=snapshot.index_cache, writer=writer
+        )
+    finally:
+        # Write remaining buffered recommendations (bulk upserts), also when matching fails,
+        # so buffered rows are not dropped and the writer thread stops
+        write_summary = flush_recommendations(writer)
+    summary = {"challenges_processed": len(challenges), **write_summary}
+    
+    return results, summary, None
+
 @app.route("/matches/campaigns", methods=["POST"])
 def generate_campaign_matches():
     """
@@ -88,117 +139,22 @@ def generate_campaign_matches():
           "finalScore": [0.80, 0.90]
         }
       ],
+      "summary": {"challenges_processed": 1, "recommendations_saved": 2},
       "processingTime": "150ms"
     }
     """
     start_time = time.time()
     
     try:
-        body = request.json or {}
-        ideas_url = body.get("ideas_url", IDEAS_URL)
-        campaigns_url = body.get("campaigns_url", CAMPAIGNS_URL)
-        challenges_url = body.get("challenges_url", CHALLENGES_URL)
-        
-        # Parameters
-        challenge_id = body.get("challenge_id")
-        save_to_db = body.get("save_to_db", True)
-        min_score = body.get("min_score", 0.1)
-        limit = body.get("limit", 10)
-        
-        # Load and preprocess data
-        ideas, campaigns, challenges = load_and_save_normalized(ideas_url, campaigns_url, challenges_url)
-        ideas = preprocess_dataframe(ideas)
-        campaigns = preprocess_dataframe(campaigns)
-        challenges = preprocess_dataframe(challenges)
-        
-        # Filter specific challenge if requested
-        if challenge_id:
-            if not is_valid_uuid(challenge_id):
-                return jsonify({"error": "Invalid challenge_id format"}), 400
-            challenges = challenges[challenges['id'] == challenge_id]
-            if challenges.empty:
-                return jsonify({"error": "Challenge not found"}), 404
-
-        # Build similarity engine
-        engine = build_similarity_engine(pd.concat([ideas, campaigns]), challenges)
-        
-        matches = []
-        
-        for _, ch_row in challenges.iterrows():
-            challenge = ch_row.to_dict()
-            cid = challenge.get("id")
-            
-            candidates = filter_candidates_by_type(challenge, ideas, campaigns)
-            if candidates.empty:
-                continue
-                
-            matched = rule_based_match_improved(
-                challenge, candidates, min_conditions_passed=1, min_score_threshold=min_score
-            )
-            if not matched:
-                continue
-
-            challenge_text = " ".join([
-                str(challenge.get("title", "")),
-                str(challenge.get("description", "")),
-                " ".join(normalize_tags(challenge.get("tags", [])))
-            ])
-            
-            # Filter only campaigns
-            campaign_recs = []
-            
-            for r in matched:
-                try:
-                    # Check if it's a campaign
-                    is_campaign = any(field in r["raw"] for field in 
-                                    ["trigger_type", "preorder_price", "supports"])
-                    
-                    if not is_campaign:
-                        continue
-                    
-                    candidate_text = " ".join([
-                        str(r["raw"].get("title", "")),
-                        str(r["raw"].get("description", "")),
-                        " ".join(normalize_tags(r["raw"].get("tags", [])))
-                    ])
-                    
-                    sim_score = engine.compute(challenge_text, candidate_text)
-                    engagement = (r["raw"].get("votes", 0) or 0) + (r["raw"].get("supports", 0) or 0)
-                    final_score = combine_scores_improved(r["score"], sim_score, engagement)
-                    
-                    campaign_recs.append({
-                        "id": r["id"],
-                        "rule_score": r["score"],
-                        "similarity_score": sim_score,
-                        "final_score": final_score
-                    })
-                    
-                    # Save to database if requested
-                    if save_to_db:
-                        save_campaign_recommendation(cid, r["id"], r["score"], sim_score, final_score)
-                        
-                except Exception as e:
-                    continue
-            
-            # Sort and limit
-            campaign_recs.sort(key=lambda x: x["final_score"], reverse=True)
-            limited_campaigns = campaign_recs[:limit]
-            
-            # Format in requested structure
-            if limited_campaigns:
-                match = {
-                    "challengeId": cid,
-                    "campaignIds": [r["id"] for r in limited_campaigns],
-                    "similarityScore": [round(r["similarity_score"], 3) for r in limited_campaigns],
-                    "ruleScore": [round(r["rule_score"], 3) for r in limited_campaigns],
-                    "finalScore": [round(r["final_score"], 3) for r in limited_campaigns]
-                }
-                matches.append(match)
+        results, summary, error = run_match_request(request.json or {}, ("campaign",), ("votes", "supports"))
+        if error:
+            return error
         
         processing_time = f"{int((time.time() - start_time) * 1000)}ms"
         
         return jsonify({
-            "matches": matches,
+            "matches": format_matches(results, "campaign"),
+            "summary": summary,
             "processingTime": processing_time
         })
         
@@ -223,117 +179,22 @@ def generate_idea_matches():
           "finalScore": [0.80, 0.90]
         }
       ],
+      "summary": {"challenges_processed": 1, "recommendations_saved": 2},
       "processingTime": "150ms"
     }
     """
     start_time = time.time()
     
     try:
-        body = request.json or {}
-        ideas_url = body.get("ideas_url", IDEAS_URL)
-        campaigns_url = body.get("campaigns_url", CAMPAIGNS_URL)
-        challenges_url = body.get("challenges_url", CHALLENGES_URL)
-        
-        # Parameters
-        challenge_id = body.get("challenge_id")
-        save_to_db = body.get("save_to_db", True)
-        min_score = body.get("min_score", 0.1)
-        limit = body.get("limit", 10)
-        
-        # Load and preprocess data
-        ideas, campaigns, challenges = load_and_save_normalized(ideas_url, campaigns_url, challenges_url)
-        ideas = preprocess_dataframe(ideas)
-        campaigns = preprocess_dataframe(campaigns)
-        challenges = preprocess_dataframe(challenges)
-        
-        # Filter specific challenge if requested
-        if challenge_id:
-            if not is_valid_uuid(challenge_id):
-                return jsonify({"error": "Invalid challenge_id format"}), 400
-            challenges = challenges[challenges['id'] == challenge_id]
-            if challenges.empty:
-                return jsonify({"error": "Challenge not found"}), 404
-
-        # Build similarity engine
-        engine = build_similarity_engine(pd.concat([ideas, campaigns]), challenges)
-        
-        matches = []
-        
-        for _, ch_row in challenges.iterrows():
-            challenge = ch_row.to_dict()
-            cid = challenge.get("id")
-            
-            candidates = filter_candidates_by_type(challenge, ideas, campaigns)
-            if candidates.empty:
-                continue
-                
-            matched = rule_based_match_improved(
-                challenge, candidates, min_conditions_passed=1, min_score_threshold=min_score
-            )
-            if not matched:
-                continue
-
-            challenge_text = " ".join([
-                str(challenge.get("title", "")),
-                str(challenge.get("description", "")),
-                " ".join(normalize_tags(challenge.get("tags", [])))
-            ])
-            
-            # Filter only ideas
-            idea_recs = []
-            
-            for r in matched:
-                try:
-                    # Check if it's an idea (not a campaign)
-                    is_campaign = any(field in r["raw"] for field in 
-                                    ["trigger_type", "preorder_price", "supports"])
-                    
-                    if is_campaign:
-                        continue
-                    
-                    candidate_text = " ".join([
-                        str(r["raw"].get("title", "")),
-                        str(r["raw"].get("description", "")),
-                        " ".join(normalize_tags(r["raw"].get("tags", [])))
-                    ])
-                    
-                    sim_score = engine.compute(challenge_text, candidate_text)
-                    engagement = (r["raw"].get("votes", 0) or 0) + (r["raw"].get("comments", 0) or 0)
-                    final_score = combine_scores_improved(r["score"], sim_score, engagement)
-                    
-                    idea_recs.append({
-                        "id": r["id"],
-                        "rule_score": r["score"],
-                        "similarity_score": sim_score,
-                        "final_score": final_score
-                    })
-                    
-                    # Save to database if requested
-                    if save_to_db:
-                        save_idea_recommendation(cid, r["id"], r["score"], sim_score, final_score)
-                        
-                except Exception as e:
-                    continue
-            
-            # Sort and limit
-            idea_recs.sort(key=lambda x: x["final_score"], reverse=True)
-            limited_ideas = idea_recs[:limit]
-            
-            # Format in requested structure
-            if limited_ideas:
-                match = {
-                    "challengeId": cid,
-                    "ideaIds": [r["id"] for r in limited_ideas],
-                    "similarityScore": [round(r["similarity_score"], 3) for r in limited_ideas],
-                    "ruleScore": [round(r["rule_score"], 3) for r in limited_ideas],
-                    "finalScore": [round(r["final_score"], 3) for r in limited_ideas]
-                }
-                matches.append(match)
+        results, summary, error = run_match_request(request.json or {}, ("idea",), ("votes", "comments"))
+        if error:
+            return error
         
         processing_time = f"{int((time.time() - start_time) * 1000)}ms"
         
         return jsonify({
-            "matches": matches,
+            "matches": format_matches(results, "idea"),
+            "summary": summary,
             "processingTime": processing_time
         })
         
@@ -351,6 +212,41 @@ def generate_all_matches():
     {
       "campaign_matches": [...],
       "idea_matches": [...],
+      "summary": {"challenges_processed": 1, "recommendations_saved": 4},
+      "processingTime": "150ms"
+    }
+    """
+    start_time = time.time()
+    
+    try:
+        results, summary, error = run_match_request(request.json or {}, ("idea", "campaign"), ("votes", "supports", "comments"))
+        if error:
+            return error
+        
+        processing_time = f"{int((time.time() - start_time) * 1000)}ms"
+        
+        return jsonify({
+            "campaign_matches": format_matches(results, "campaign"),
+            "idea_matches": format_matches(results, "idea"),
+            "summary": summary,
+            "processingTime": processing_time
+        })
+        
+    except Exception as e:
+        processing_time = f"{int((time.time() - start_time) * 1000)}ms"
+        return jsonify({
+            "error": str(e),
+            "processingTime": processing_time
+        }), 500
+
+@app.route("/model/rebuild", methods=["POST"])
+def rebuild_model():
+    """
+    Force refit + persist similarity model untuk corpus saat ini:
+    {
+      "version": "3f9a...",
+      "documents": 1234,
+      "vocabularySize": 5000,
       "processingTime": "150ms"
     }
     """
@@ -362,123 +258,48 @@ def generate_all_matches():
         campaigns_url = body.get("campaigns_url", CAMPAIGNS_URL)
         challenges_url = body.get("challenges_url", CHALLENGES_URL)
         
-        # Parameters
-        challenge_id = body.get("challenge_id")
-        save_to_db = body.get("save_to_db", True)
-        min_score = body.get("min_score", 0.1)
-        limit = body.get("limit", 10)
-        
-        # Load and preprocess data (single pass)
-        ideas, campaigns, challenges = load_and_save_normalized(ideas_url, campaigns_url, challenges_url)
-        ideas = preprocess_dataframe(ideas)
-        campaigns = preprocess_dataframe(campaigns)
-        challenges = preprocess_dataframe(challenges)
-        
-        # Filter specific challenge if requested
-        if challenge_id:
-            if not is_valid_uuid(challenge_id):
-                return jsonify({"error": "Invalid challenge_id format"}), 400
-            challenges = challenges[challenges['id'] == challenge_id]
-            if challenges.empty:
-                return jsonify({"error": "Challenge not found"}), 404
-
-        # Build similarity engine (single pass)
-        engine = build_similarity_engine(pd.concat([ideas, campaigns]), challenges)
-        
-        campaign_matches = []
-        idea_matches = []
-        
-        for _, ch_row in challenges.iterrows():
-            challenge = ch_row.to_dict()
-            cid = challenge.get("id")
-            
-            candidates = filter_candidates_by_type(challenge, ideas, campaigns)
-            if candidates.empty:
-                continue
-                
-            matched = rule_based_match_improved(
-                challenge, candidates, min_conditions_passed=1, min_score_threshold=min_score
-            )
-            if not matched:
-                continue
-
-            challenge_text = " ".join([
-                str(challenge.get("title", "")),
-                str(challenge.get("description", "")),
-                " ".join(normalize_tags(challenge.get("tags", [])))
-            ])
-            
-            campaign_recs = []
-            idea_recs = []
-            
-            for r in matched:
-                try:
-                    candidate_text = " ".join([
-                        str(r["raw"].get("title", "")),
-                        str(r["raw"].get("description", "")),
-                        " ".join(normalize_tags(r["raw"].get("tags", [])))
-                    ])
-                    
-                    sim_score = engine.compute(challenge_text, candidate_text)
-                    engagement = (r["raw"].get("votes", 0) or 0) + (r["raw"].get("supports", 0) or 0) + (r["raw"].get("comments", 0) or 0)
-                    final_score = combine_scores_improved(r["score"], sim_score, engagement)
-                    
-                    rec_data = {
-                        "id": r["id"],
-                        "rule_score": r["score"],
-                        "similarity_score": sim_score,
-                        "final_score": final_score
-                    }
-                    
-                    # Determine type
-                    is_campaign = any(field in r["raw"] for field in 
-                                    ["trigger_type", "preorder_price", "supports"])
-                    
-                    if is_campaign:
-                        campaign_recs.append(rec_data)
-                        if save_to_db:
-                            save_campaign_recommendation(cid, r["id"], r["score"], sim_score, final_score)
-                    else:
-                        idea_recs.append(rec_data)
-                        if save_to_db:
-                            save_idea_recommendation(cid, r["id"], r["score"], sim_score, final_score)
-                        
-                except Exception as e:
-                    continue
-            
-            # Sort and limit campaigns
-            campaign_recs.sort(key=lambda x: x["final_score"], reverse=True)
-            limited_campaigns = campaign_recs[:limit]
-            
-            if limited_campaigns:
-                campaign_match = {
-                    "challengeId": cid,
-                    "campaignIds": [r["id"] for r in limited_campaigns],
-                    "similarityScore": [round(r["similarity_score"], 3) for r in limited_campaigns],
-                    "ruleScore": [round(r["rule_score"], 3) for r in limited_campaigns],
-                    "finalScore": [round(r["final_score"], 3) for r in limited_campaigns]
-                }
-                campaign_matches.append(campaign_match)
-            
-            # Sort and limit ideas
-            idea_recs.sort(key=lambda x: x["final_score"], reverse=True)
-            limited_ideas = idea_recs[:limit]
-            
-            if limited_ideas:
-                idea_match = {
-                    "challengeId": cid,
-                    "ideaIds": [r["id"] for r in limited_ideas],
-                    "similarityScore": [round(r["similarity_score"], 3) for r in limited_ideas],
-                    "ruleScore": [round(r["rule_score"], 3) for r in limited_ideas],
-                    "finalScore": [round(r["final_score"], 3) for r in limited_ideas]
-                }
-                idea_matches.append(idea_match)
+        # Re-ingest + force refit, lalu swap snapshot yang dipakai /matches*
+        engine = snapshot_store.refresh(ideas_url, campaigns_url, challenges_url, force_rebuild=True).engine
+        
+        processing_time = f"{int((time.time() - start_time) * 1000)}ms"
+        
+        return jsonify({
+            "version": engine.version,
+            "documents": len(engine.ids),
+            "vocabularySize": len(engine.vectorizer.vocabulary_),
+            "processingTime": processing_time
+        })
+        
+    except Exception as e:
+        processing_time = f"{int((time.time() - start_time) * 1000)}ms"
+        return jsonify({
+            "error": str(e),
+            "processingTime": processing_time
+        }), 500
+
+@app.route("/ingest", methods=["POST"])
+def ingest():
+    """
+    Fetch + save upstream data dan bangun ulang snapshot matching sekarang:
+    {
+      "snapshot": {"ideas": 120, "campaigns": 40, "challenges": 12, "modelVersion": "3f9a...", ...},
+      "processingTime": "1500ms"
+    }
+    """
+    start_time = time.time()
+    
+    try:
+        body = request.json or {}
+        ideas_url = body.get("ideas_url", IDEAS_URL)
+        campaigns_url = body.get("campaigns_url", CAMPAIGNS_URL)
+        challenges_url = body.get("challenges_url", CHALLENGES_URL)
+        
+        snapshot = snapshot_store.refresh(ideas_url, campaigns_url, challenges_url)
         
         processing_time = f"{int((time.time() - start_time) * 1000)}ms"
         
         return jsonify({
-            "campaign_matches": campaign_matches,
-            "idea_matches": idea_matches,
+            "snapshot": snapshot.describe(),
             "processingTime": processing_time
         })
         
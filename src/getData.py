@@ -1,9 +1,20 @@
+import os
+import queue
+import threading
 import requests
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from supabase import create_client
-from typing import Tuple
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+import json
 import uuid
 import math
+from src.logger import fields, get_logger
+from src.syncCache import snapshot_hash, sync_cache
+
+logger = get_logger("getData")
 
 # Konfigurasi Supabase
 SUPABASE_URL = "https://uiglmxbrvdmgcfqrfsgc.supabase.co"
@@ -29,15 +40,120 @@ def safe_float(value):
     except (ValueError, TypeError):
         return 0.0
 
-def fetch_api(url: str):
+# HTTP ke upstream list APIs: (connect, read) timeout dan retry dengan backoff
+FETCH_CONNECT_TIMEOUT = float(os.environ.get("FETCH_CONNECT_TIMEOUT", "5"))
+FETCH_READ_TIMEOUT = float(os.environ.get("FETCH_READ_TIMEOUT", "60"))
+FETCH_RETRIES = int(os.environ.get("FETCH_RETRIES", "3"))
+FETCH_BACKOFF = float(os.environ.get("FETCH_BACKOFF", "0.5"))
+# Paginated ingestion: records per page (0 = satu request untuk seluruh list)
+FETCH_PAGE_SIZE = int(os.environ.get("FETCH_PAGE_SIZE", "0"))
+FETCH_PAGE_PARAM = os.environ.get("FETCH_PAGE_PARAM", "page")
+FETCH_LIMIT_PARAM = os.environ.get("FETCH_LIMIT_PARAM", "limit")
+# Recommendation writes: rows per bulk upsert, dan apakah batch ditulis di background thread
+RECOMMENDATION_BATCH_SIZE = int(os.environ.get("RECOMMENDATION_BATCH_SIZE", "500"))
+RECOMMENDATION_ASYNC = os.environ.get("RECOMMENDATION_ASYNC", "1") == "1"
+# Rows per bulk upsert untuk users
+USER_UPSERT_CHUNK = int(os.environ.get("USER_UPSERT_CHUNK", "500"))
+
+_session = None
+_session_lock = threading.Lock()
+
+# Nilai kolom categorical entity_type di frame ideas / campaigns
+ENTITY_TYPES = ("idea", "campaign")
+
+
+def get_http_session() -> requests.Session:
+    """Shared Session (keep-alive, connection pool, retry + backoff untuk GET)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=FETCH_RETRIES,
+                backoff_factor=FETCH_BACKOFF,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(["GET"]),
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def fetch_api(url: str, params: dict = None):
     """Fetch data dari API (return list of dict)."""
     if not url:
         return []
-    resp = requests.get(url)
+    resp = get_http_session().get(url, params=params, timeout=(FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT))
     resp.raise_for_status()
     payload = resp.json()
     return payload.get("data", []) if isinstance(payload, dict) else payload
 
+
+def iter_api_pages(url: str, page_size: int = FETCH_PAGE_SIZE) -> Iterator[list]:
+    """
+    Yield records per page (?page=N&limit=page_size) sampai page terakhir.
+    page_size <= 0: satu request untuk seluruh list.
+    Guard untuk upstream yang tidak mendukung pagination: page yang lebih besar dari
+    page_size atau page yang berulang dianggap payload lengkap, lalu berhenti.
+    """
+    if not url:
+        return
+    if page_size <= 0:
+        yield fetch_api(url)
+        return
+
+    page = 1
+    seen_first = set()
+    while True:
+        records = fetch_api(url, params={FETCH_PAGE_PARAM: page, FETCH_LIMIT_PARAM: page_size})
+        if not records:
+            return
+        first = records[0].get("id") if isinstance(records[0], dict) else None
+        if first is not None and first in seen_first:
+            logger.warning("⚠️ %s returned page %d again, upstream ignores pagination", url, page)
+            return
+        seen_first.add(first)
+        yield records
+        if len(records) > page_size:
+            logger.warning("⚠️ %s returned %d records for page size %d, upstream ignores pagination",
+                           url, len(records), page_size)
+            return
+        if len(records) < page_size:
+            return
+        page += 1
+
+
+def tag_entity_type(df: pd.DataFrame, entity_type: str) -> pd.DataFrame:
+    """Tambah kolom categorical entity_type supaya type bisa dipisah dengan mask (tanpa sniffing field)."""
+    df["entity_type"] = pd.Categorical([entity_type] * len(df), categories=ENTITY_TYPES)
+    return df
+
+
+def ingest_source(pages: Iterable[list], save_chunk: Callable[[list], list],
+                  save_users: bool = True) -> Tuple[pd.DataFrame, int]:
+    """
+    Stream satu source: per page simpan users + entity (save_chunk) lalu buat DataFrame chunk.
+    Hanya satu page raw records yang ditahan di memory. Return (DataFrame, jumlah raw records).
+    save_users=False kalau users semua source sudah disimpan sebelumnya.
+    """
+    frames = []
+    fetched = 0
+    for records in pages:
+        fetched += len(records)
+        # Users dulu (creator_id entity refer ke users)
+        if save_users:
+            save_users_from_records(records)
+        saved = save_chunk(records)
+        if saved:
+            frames.append(pd.DataFrame(saved))
+    if not frames:
+        return pd.DataFrame(), fetched
+    if len(frames) == 1:
+        return frames[0], fetched
+    return pd.concat(frames, ignore_index=True), fetched
+
 def save_users_from_records(records):
     users = []
     for r in records:
@@ -61,9 +177,67 @@ def save_users_from_records(records):
 
     final_users = list(unique_users.values())
 
+    # Hanya users yang baru / berubah sejak sync terakhir, dikirim per chunk
+    changed_users = sync_cache.changed("users", final_users)
+    for start in range(0, len(changed_users), USER_UPSERT_CHUNK):
+        chunk = changed_users[start:start + USER_UPSERT_CHUNK]
+        supabase.table("users").upsert(chunk, on_conflict=["id"]).execute()
+        sync_cache.mark("users", chunk)
     if final_users:
-        for u in final_users:
-            supabase.table("users").upsert(u, on_conflict=["id"]).execute()
+        logger.debug("👥 Users synced", extra=fields(unique=len(final_users), upserted=len(changed_users)))
+
+# Namespace untuk uuid5 condition id (jangan diubah: id condition yang sudah tersimpan bergantung padanya)
+CONDITION_NAMESPACE = uuid.UUID("6f1c1d2e-8a4b-5c39-9e0f-3b7d2a61c4e8")
+
+def _canonical(value):
+    """Bentuk hashable yang stabil: scalar -> str (seperti perbandingan lama), list/dict -> JSON sorted."""
+    if isinstance(value, (list, tuple, dict)):
+        return json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+    return str(value)
+
+def _canonical_words(words):
+    """Words dicocokkan sebagai set (lowercase, strip), jadi urutan / duplikat / case tidak mengubah key."""
+    if words is None:
+        words = []
+    if not isinstance(words, (list, tuple)):
+        return _canonical(words)
+    return _canonical(sorted({w for w in (str(w).lower().strip() for w in words if w) if w}))
+
+def condition_key(condition: dict) -> tuple:
+    """Key kanonik untuk dedup condition (kind, field, operator, value, words)."""
+    return (
+        condition.get("kind"),
+        condition.get("field"),
+        condition.get("operator"),
+        _canonical(condition.get("value")),
+        _canonical_words(condition.get("words")),
+    )
+
+def condition_id(challenge_id: str, condition: dict) -> str:
+    """uuid5 deterministik dari challenge + isi condition: save ulang = update row yang sama."""
+    return str(uuid.uuid5(CONDITION_NAMESPACE, json.dumps([challenge_id, *condition_key(condition)], ensure_ascii=False)))
+
+def _condition_record(challenge_id: str, condition: dict) -> dict:
+    record = {
+        "challenge_id": challenge_id,
+        "kind": condition.get("kind"),
+        "field": condition.get("field"),
+        "value": condition.get("value"),
+        "operator": condition.get("operator"),
+        "words": condition.get("words"),
+    }
+    record["id"] = condition_id(challenge_id, record)
+    return record
+
+def upsert_changed(table: str, records: list, key="id") -> int:
+    """Upsert (on_conflict id) hanya record yang baru / berubah sejak sync terakhir. Return jumlah yang dikirim."""
+    changed = sync_cache.changed(table, records, key=key)
+    if changed:
+        supabase.table(table).upsert(changed, on_conflict=["id"]).execute()
+        sync_cache.mark(table, changed, key=key)
+    if records:
+        logger.debug("💾 %s synced", table, extra=fields(records=len(records), upserted=len(changed)))
+    return len(changed)
 
 def save_ideas_normalized(ideas):
     """Save ideas tanpa challenge_id - clean entity"""
@@ -88,8 +262,7 @@ def save_ideas_normalized(ideas):
             
         normalized.append(idea)
     
-    if normalized:
-        supabase.table("ideas").upsert(normalized, on_conflict=["id"]).execute()
+    upsert_changed("ideas", normalized)
     
     return normalized
 
@@ -127,8 +300,7 @@ def save_campaigns_normalized(campaigns):
             
         normalized.append(campaign)
     
-    if normalized:
-        supabase.table("campaigns").upsert(normalized, on_conflict=["id"]).execute()
+    upsert_changed("campaigns", normalized)
     
     return normalized
 
@@ -138,7 +310,8 @@ def save_challenges_normalized_without_conditions_column(challenges):
         return []
         
     normalized = []
-    conditions_to_save = []
+    # condition id -> record (duplikat di payload jadi satu row, satu upsert tidak boleh kena row yang sama dua kali)
+    conditions_to_save = {}
     
     # Debug: check berapa challenges yang punya conditions
     challenges_with_conditions = 0
@@ -171,43 +344,28 @@ def save_challenges_normalized_without_conditions_column(challenges):
 
         # Save conditions to separate table
         if conditions:
-            if isinstance(conditions, list):
-                for cond in conditions:
-                    conditions_to_save.append({
-                        "challenge_id": challenge['id'],
-                        "kind": cond.get("kind"),
-                        "field": cond.get("field"),
-                        "value": cond.get("value"),
-                        "operator": cond.get("operator"),
-                        "words": cond.get("words"),
-                    })
-            else:
-                # Single condition (not in array)
-                conditions_to_save.append({
-                    "challenge_id": challenge['id'],
-                    "kind": conditions.get("kind"),
-                    "field": conditions.get("field"),
-                    "value": conditions.get("value"),
-                    "operator": conditions.get("operator"),
-                    "words": conditions.get("words"),
-                })
+            # Single condition (not in array) diperlakukan sebagai list satu item
+            for cond in (conditions if isinstance(conditions, list) else [conditions]):
+                cond_record = _condition_record(challenge['id'], cond)
+                conditions_to_save[cond_record["id"]] = cond_record
             
         normalized.append(challenge)
     
-    print(f"📊 Challenges processing:")
-    print(f"   Total challenges: {len(normalized)}")
-    print(f"   Challenges with conditions: {challenges_with_conditions}")
-    print(f"   Total conditions: {total_conditions}")
+    logger.info("📊 Challenges processing", extra=fields(
+        challenges=len(normalized),
+        with_conditions=challenges_with_conditions,
+        conditions=total_conditions,
+    ))
     
     # Save challenges (tanpa conditions field)
     if normalized:
-        supabase.table("challenges").upsert(normalized, on_conflict=["id"]).execute()
-        print(f"✅ Saved {len(normalized)} challenges to main table")
+        saved = upsert_changed("challenges", normalized)
+        logger.info("✅ Saved %d challenges to main table (%d unchanged)", saved, len(normalized) - saved)
     
     # Save conditions to separate table
     if conditions_to_save:
-        supabase.table("challenge_conditions").upsert(conditions_to_save).execute()
-        print(f"✅ Saved {len(conditions_to_save)} conditions to separate table")
+        saved = upsert_changed("challenge_conditions", list(conditions_to_save.values()))
+        logger.info("✅ Saved %d conditions to separate table (%d unchanged)", saved, len(conditions_to_save) - saved)
     
     return normalized
 
@@ -222,6 +380,7 @@ def load_conditions_from_separate_table(challenge_ids: list) -> dict:
         result = supabase.table("challenge_conditions").select("*").in_("challenge_id", challenge_ids).execute()
         
         conditions_by_challenge = {}
+        seen = set()
         for condition in result.data:
             challenge_id = condition["challenge_id"]
             if challenge_id not in conditions_by_challenge:
@@ -236,32 +395,37 @@ def load_conditions_from_separate_table(challenge_ids: list) -> dict:
                 "words": condition.get("words", [])
             }
             
-            # Check for duplicates before adding
-            is_duplicate = False
-            for existing_cond in conditions_by_challenge[challenge_id]:
-                if (existing_cond.get("kind") == cond_dict.get("kind") and
-                    existing_cond.get("field") == cond_dict.get("field") and
-                    existing_cond.get("operator") == cond_dict.get("operator") and
-                    str(existing_cond.get("value")) == str(cond_dict.get("value")) and
-                    str(existing_cond.get("words")) == str(cond_dict.get("words"))):
-                    is_duplicate = True
-                    break
-            
-            if not is_duplicate:
+            # Skip duplicates (rows lama tanpa deterministic id), O(1) per condition
+            key = (challenge_id, condition_key(cond_dict))
+            if key not in seen:
+                seen.add(key)
                 conditions_by_challenge[challenge_id].append(cond_dict)
         
         # Debug info
         for challenge_id, conditions in conditions_by_challenge.items():
             if len(conditions) > 5:
-                print(f"⚠️ Challenge {challenge_id} has {len(conditions)} conditions (might be duplicates)")
+                logger.warning("⚠️ Challenge %s has %d conditions (might be duplicates)", challenge_id, len(conditions))
         
-        print(f"✅ Loaded conditions for {len(conditions_by_challenge)} challenges from separate table")
+        logger.info("✅ Loaded conditions for %d challenges from separate table", len(conditions_by_challenge))
         return conditions_by_challenge
         
     except Exception as e:
-        print(f"⚠️ Error loading conditions from separate table: {e}")
+        logger.warning("⚠️ Error loading conditions from separate table: %s", e)
         return {}
 
+def load_challenge(challenge_id: str) -> pd.DataFrame:
+    """
+    Satu challenge + conditions langsung dari DB (read-only: tanpa fetch upstream / upsert).
+    DataFrame kosong kalau challenge tidak ada.
+    """
+    result = supabase.table("challenges").select("*").eq("id", challenge_id).execute()
+    if not result.data:
+        return pd.DataFrame()
+    challenge_df = pd.DataFrame(result.data)
+    conditions_dict = load_conditions_from_separate_table([challenge_id])
+    challenge_df["conditions"] = [conditions_dict.get(cid, []) for cid in challenge_df["id"]]
+    return challenge_df
+
 def load_data(ideas_url, campaigns_url, challenges_url):
     """Backward compatibility function"""
     return load_and_save_normalized(ideas_url, campaigns_url, challenges_url)
@@ -270,27 +434,57 @@ def load_and_save_normalized(ideas_url, campaigns_url, challenges_url):
     """
     Main function yang menghandle conditions dari separate table
     """
-    print("🔥 Fetching data from APIs...")
-    
-    # 1. Fetch raw data
-    ideas_raw = fetch_api(ideas_url)
-    campaigns_raw = fetch_api(campaigns_url)
-    challenges_raw = fetch_api(challenges_url)
+    frames, _ = ingest_snapshot(ideas_url, campaigns_url, challenges_url)
+    return frames
+
+def ingest_snapshot(ideas_url, campaigns_url, challenges_url,
+                    known_hash: Optional[str] = None) -> Tuple[Optional[Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]], Optional[str]]:
+    """
+    Fetch + save ketiga source, return ((ideas_df, campaigns_df, challenges_df), snapshot hash).
+    Kalau hash payload upstream sama dengan known_hash (ingestion terakhir si caller), tidak ada
+    normalisasi / save dan frames = None: caller memakai frames yang sudah dipegangnya.
+    Hash None untuk paginated ingestion (seluruh payload tidak pernah ada di memory sekaligus).
+    """
+    logger.info("🔥 Fetching data from APIs...")
     
-    print(f"📊 Fetched: {len(ideas_raw)} ideas, {len(campaigns_raw)} campaigns, {len(challenges_raw)} challenges")
+    urls = [ideas_url, campaigns_url, challenges_url]
+    savers = [save_ideas_normalized, save_campaigns_normalized, save_challenges_normalized_without_conditions_column]
     
-    # 2. Save users first
-    save_users_from_records(ideas_raw + campaigns_raw + challenges_raw)
+    snapshot = None
+    if FETCH_PAGE_SIZE > 0:
+        # Paginated: page di-stream langsung ke save; snapshot tidak dicek (perlu seluruh payload),
+        # record yang tidak berubah tetap di-skip oleh sync cache. Users disimpan per page
+        # (sebelum entity di page itu), jadi user yang muncul di beberapa source bisa di-upsert lagi.
+        page_sources = [iter_api_pages(url) for url in urls]
+        save_users = True
+    else:
+        # Fetch ketiga source dulu (paralel), lalu cek snapshot sebelum normalisasi / save
+        with ThreadPoolExecutor(max_workers=len(urls)) as pool:
+            payloads = list(pool.map(fetch_api, urls))
+        snapshot = snapshot_hash([urls, *payloads])
+        if known_hash is not None and snapshot == known_hash:
+            logger.info("✅ Upstream snapshot unchanged, reusing last ingestion", extra=fields(snapshot=snapshot[:12]))
+            return None, snapshot
+        # Users dari ketiga source di-dedupe dan disimpan sekali, sebelum entity di-save paralel
+        save_users_from_records([record for payload in payloads for record in payload])
+        page_sources = [[payload] for payload in payloads]
+        save_users = False
+        del payloads
     
-    # 3. Save core entities
-    ideas_saved = save_ideas_normalized(ideas_raw)
-    campaigns_saved = save_campaigns_normalized(campaigns_raw)
-    challenges_saved = save_challenges_normalized_without_conditions_column(challenges_raw)
+    # 1-4. Save users + entities (hanya yang berubah), build DataFrames.
+    # Ketiga source jalan paralel; wall time = source paling lambat.
+    with ThreadPoolExecutor(max_workers=len(urls)) as pool:
+        futures = [pool.submit(ingest_source, pages, save_chunk, save_users)
+                   for pages, save_chunk in zip(page_sources, savers)]
+        (ideas_df, n_ideas), (campaigns_df, n_campaigns), (challenges_df, n_challenges) = [
+            future.result() for future in futures
+        ]
     
-    # 4. Convert to DataFrames
-    ideas_df = pd.DataFrame(ideas_saved) if ideas_saved else pd.DataFrame()
-    campaigns_df = pd.DataFrame(campaigns_saved) if campaigns_saved else pd.DataFrame()
-    challenges_df = pd.DataFrame(challenges_saved) if challenges_saved else pd.DataFrame()
+    logger.info("📊 Fetched data", extra=fields(
+        ideas=n_ideas, campaigns=n_campaigns, challenges=n_challenges,
+    ))
+    tag_entity_type(ideas_df, "idea")
+    tag_entity_type(campaigns_df, "campaign")
     
     # 5. PENTING: Load conditions dan merge ke DataFrame
     if not challenges_df.empty:
@@ -305,9 +499,130 @@ def load_and_save_normalized(ideas_url, campaigns_url, challenges_url):
         
         # Debug: Check berapa challenges yang dapat conditions
         challenges_with_conditions = sum(1 for conditions in challenges_df['conditions'] if conditions)
-        print(f"📊 Final DataFrame: {challenges_with_conditions}/{len(challenges_df)} challenges have conditions")
+        logger.info("📊 Final DataFrame: %d/%d challenges have conditions", challenges_with_conditions, len(challenges_df))
     
-    return ideas_df, campaigns_df, challenges_df
+    return (ideas_df, campaigns_df, challenges_df), snapshot
+
+def _recommendation_record(challenge_id, key: str, entity_id, rule_score, similarity_score, final_score) -> dict:
+    return {
+        "challenge_id": challenge_id,
+        key: entity_id,
+        "rule_score": safe_float(rule_score),
+        "similarity_score": safe_float(similarity_score),
+        "final_score": safe_float(final_score),
+        "created_at": pd.Timestamp.utcnow().isoformat()
+    }
+
+
+class RecommendationWriter:
+    """
+    Buffer recommendation rows per table dan tulis dengan bulk upsert per batch_size rows.
+    - background=True: batch yang penuh ditulis oleh background thread selagi matching jalan.
+    - flush() di akhir request menulis sisa buffer dan menunggu semua batch selesai.
+    Batch yang gagal di-log dan dihitung di stats; batch lain tetap ditulis.
+    """
+
+    TABLES = {
+        "idea": ("idea_recommendations", "idea_id"),
+        "campaign": ("campaign_recommendations", "campaign_id"),
+    }
+
+    def __init__(self, batch_size: int = RECOMMENDATION_BATCH_SIZE, background: bool = RECOMMENDATION_ASYNC):
+        self.batch_size = max(1, int(batch_size))
+        self.background = background
+        self._buffers = {kind: [] for kind in self.TABLES}
+        self._lock = threading.Lock()
+        self.stats = {"saved": 0, "failed": 0, "batches": 0, "failed_batches": 0}
+        self.errors: List[dict] = []
+        self._queue = None
+        self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+    def add_idea(self, challenge_id, idea_id, rule_score=0.0, similarity_score=0.0, final_score=0.0) -> bool:
+        return self._add("idea", challenge_id, idea_id, rule_score, similarity_score, final_score)
+
+    def add_campaign(self, challenge_id, campaign_id, rule_score=0.0, similarity_score=0.0, final_score=0.0) -> bool:
+        return self._add("campaign", challenge_id, campaign_id, rule_score, similarity_score, final_score)
+
+    def _add(self, kind, challenge_id, entity_id, rule_score, similarity_score, final_score) -> bool:
+        table, key = self.TABLES[kind]
+        if not challenge_id or not entity_id:
+            logger.error("❌ Missing IDs: challenge_id=%s, %s=%s", challenge_id, key, entity_id)
+            return False
+        record = _recommendation_record(challenge_id, key, entity_id, rule_score, similarity_score, final_score)
+        with self._lock:
+            buffer = self._buffers[kind]
+            buffer.append(record)
+            if len(buffer) < self.batch_size:
+                return True
+            self._buffers[kind] = []
+        self._submit(table, buffer)
+        return True
+
+    def _submit(self, table: str, rows: list):
+        if not self.background:
+            self._write(table, rows)
+            return
+        if self._thread is None:
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._drain, name="recommendation-writer", daemon=True)
+            self._thread.start()
+        self._queue.put((table, rows))
+
+    def _drain(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, table: str, rows: list):
+        try:
+            supabase.table(table).upsert(rows).execute()
+            outcome = ("saved", None)
+        except Exception as e:
+            outcome = ("failed", e)
+        with self._lock:
+            self.stats["batches"] += 1
+            if outcome[0] == "saved":
+                self.stats["saved"] += len(rows)
+            else:
+                self.stats["failed"] += len(rows)
+                self.stats["failed_batches"] += 1
+                self.errors.append({"table": table, "rows": len(rows), "error": str(outcome[1])})
+        if outcome[1] is not None:
+            logger.error("❌ Error saving %d rows to %s: %s", len(rows), table, outcome[1])
+        else:
+            logger.debug("✅ Saved %d rows to %s", len(rows), table)
+
+    def flush(self) -> dict:
+        """Tulis semua row yang masih di buffer, tunggu background writes, return stats."""
+        with self._lock:
+            pending = [(self.TABLES[kind][0], rows) for kind, rows in self._buffers.items() if rows]
+            self._buffers = {kind: [] for kind in self.TABLES}
+        for table, rows in pending:
+            self._submit(table, rows)
+        if self._thread is not None:
+            self._queue.put(None)
+            self._queue.join()
+            self._thread.join()
+            self._thread = None
+            self._queue = None
+        if self.stats["failed"]:
+            logger.warning("⚠️ Recommendation writer: %d rows failed", self.stats["failed"], extra=fields(**self.stats))
+        else:
+            logger.info("💾 Recommendation writer flushed", extra=fields(**self.stats))
+        return dict(self.stats)
+
 
 # Updated functions with correct table names
 def save_idea_recommendation(
@@ -321,26 +636,19 @@ def save_idea_recommendation(
     Save idea recommendation to challenge_idea_recommendations table
     """
     if not challenge_id or not idea_id:
-        print(f"❌ Missing IDs: challenge_id={challenge_id}, idea_id={idea_id}")
+        logger.error("❌ Missing IDs: challenge_id=%s, idea_id=%s", challenge_id, idea_id)
         return False
 
-    record = {
-        "challenge_id": challenge_id,
-        "idea_id": idea_id,
-        "rule_score": safe_float(rule_score),
-        "similarity_score": safe_float(similarity_score),
-        "final_score": safe_float(final_score),
-        "created_at": pd.Timestamp.utcnow().isoformat()
-    }
+    record = _recommendation_record(challenge_id, "idea_id", idea_id, rule_score, similarity_score, final_score)
 
     try:
         supabase.table("idea_recommendations").upsert(
             record,
         ).execute()
-        print(f"✅ Saved idea recommendation: {challenge_id} -> {idea_id}")
+        logger.debug("✅ Saved idea recommendation: %s -> %s", challenge_id, idea_id)
         return True
     except Exception as e:
-        print(f"❌ Error saving idea recommendation: {e}")
+        logger.error("❌ Error saving idea recommendation %s -> %s: %s", challenge_id, idea_id, e)
         return False
 
 def save_campaign_recommendation(
@@ -354,37 +662,30 @@ def save_campaign_recommendation(
     Save campaign recommendation to challenge_campaign_recommendations table
     """
     if not challenge_id or not campaign_id:
-        print(f"❌ Missing IDs: challenge_id={challenge_id}, campaign_id={campaign_id}")
+        logger.error("❌ Missing IDs: challenge_id=%s, campaign_id=%s", challenge_id, campaign_id)
         return False
 
-    record = {
-        "challenge_id": challenge_id,
-        "campaign_id": campaign_id,
-        "rule_score": safe_float(rule_score),
-        "similarity_score": safe_float(similarity_score),
-        "final_score": safe_float(final_score),
-        "created_at": pd.Timestamp.utcnow().isoformat()
-    }
+    record = _recommendation_record(challenge_id, "campaign_id", campaign_id, rule_score, similarity_score, final_score)
 
     try:
         supabase.table("campaign_recommendations").upsert(
             record,
         ).execute()
-        print(f"✅ Saved campaign recommendation: {challenge_id} -> {campaign_id}")
+        logger.debug("✅ Saved campaign recommendation: %s -> %s", challenge_id, campaign_id)
         return True
     except Exception as e:
-        print(f"❌ Error saving campaign recommendation: {e}")
+        logger.error("❌ Error saving campaign recommendation %s -> %s: %s", challenge_id, campaign_id, e)
         return False
 
 # Legacy functions for backward compatibility (deprecated)
 def save_challenge_idea(challenge_id: str, idea_id: str, rule_score: float = 0.0, 
                        sim_score: float = 0.0, final_score: float = 0.0):
     """Deprecated: Use save_idea_recommendation instead"""
-    print("⚠️ save_challenge_idea is deprecated, use save_idea_recommendation")
+    logger.warning("⚠️ save_challenge_idea is deprecated, use save_idea_recommendation")
     return save_idea_recommendation(challenge_id, idea_id, rule_score, sim_score, final_score)
 
 def save_challenge_campaign(challenge_id: str, campaign_id: str, rule_score: float = 0.0, 
                            sim_score: float = 0.0, final_score: float = 0.0):
     """Deprecated: Use save_campaign_recommendation instead"""
-    print("⚠️ save_challenge_campaign is deprecated, use save_campaign_recommendation")
+    logger.warning("⚠️ save_challenge_campaign is deprecated, use save_campaign_recommendation")
     return save_campaign_recommendation(challenge_id, campaign_id, rule_score, sim_score, final_score)
\ No newline at end of file
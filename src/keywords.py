@@ -0,0 +1,58 @@
+from typing import Iterable, List, Set
+import numpy as np
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick tidak terpasang -> fallback substring scan per keyword
+    ahocorasick = None
+
+
+class KeywordMatcher:
+    """
+    Multi-pattern substring matcher untuk kondisi "words".
+    Semua keywords di-compile sekali menjadi satu Aho-Corasick automaton, lalu
+    setiap text cukup di-scan satu kali untuk mendapatkan semua keyword yang muncul.
+    Hasilnya sama dengan `w in text` per keyword (substring, case dari caller).
+    """
+
+    def __init__(self, words: Iterable[str]):
+        # Unique, urutan dipertahankan; string kosong tidak pernah dicari
+        self.words: List[str] = list(dict.fromkeys(w for w in words if w))
+        self.index = {w: i for i, w in enumerate(self.words)}
+        self._automaton = None
+        if ahocorasick is not None and self.words:
+            automaton = ahocorasick.Automaton()
+            for i, word in enumerate(self.words):
+                automaton.add_word(word, i)
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def __len__(self):
+        return len(self.words)
+
+    def find(self, text: str) -> Set[int]:
+        """Index (di self.words) dari semua keyword yang muncul di text."""
+        if not self.words or not text:
+            return set()
+        if self._automaton is not None:
+            return {i for _, i in self._automaton.iter(text)}
+        return {i for i, word in enumerate(self.words) if word in text}
+
+    def contains(self, text: str, match_all: bool = False) -> bool:
+        """any/all keyword muncul di text (all() untuk list kosong = True)."""
+        hits = self.find(text)
+        if match_all:
+            return len(hits) == len(self.words)
+        return bool(hits)
+
+    def hits_matrix(self, texts: Iterable[str]) -> np.ndarray:
+        """Bool matrix shape (len(texts), len(words)): hit per text per keyword."""
+        texts = list(texts)
+        hits = np.zeros((len(texts), len(self.words)), dtype=bool)
+        if not self.words:
+            return hits
+        for row, text in enumerate(texts):
+            found = self.find(text)
+            if found:
+                hits[row, list(found)] = True
+        return hits
@@ -0,0 +1,61 @@
+"""
+Logging untuk pipeline matching (ruledBased, getData, main).
+
+- Level lewat env LOG_LEVEL (default INFO).
+- Record bisa membawa field terstruktur: logger.info("msg", extra=fields(challenge_id=..., matched=...))
+  dan formatter menambahkan key=value di belakang message.
+- Trace debug per candidate di-sample (LOG_SAMPLE_RATE) supaya log tidak banjir.
+
+Pakai %-style args (logger.debug("x %s", y)), bukan f-string: message hanya di-format
+kalau level-nya aktif, jadi di level INFO hot path tidak melakukan string formatting.
+"""
+import logging
+import os
+import random
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# Porsi trace debug per candidate/condition yang benar-benar ditulis
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "0.01"))
+
+_ROOT = "matching"
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Format standar + field terstruktur (record.fields) sebagai key=value."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        record_fields = getattr(record, "fields", None)
+        if record_fields:
+            message += " | " + " ".join(f"{key}={value}" for key, value in record_fields.items())
+        return message
+
+
+def _configure():
+    root = logging.getLogger(_ROOT)
+    if root.handlers:
+        return root
+    handler = logging.StreamHandler()
+    handler.setFormatter(KeyValueFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+    root.propagate = False
+    return root
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger di bawah namespace "matching" (mis. get_logger("ruledBased"))."""
+    _configure()
+    return logging.getLogger(f"{_ROOT}.{name}")
+
+
+def fields(**values) -> dict:
+    """extra= untuk record terstruktur."""
+    return {"fields": values}
+
+
+def sampled(logger: logging.Logger, level: int = logging.DEBUG, rate: float = None) -> bool:
+    """True kalau level aktif dan trace ini terpilih oleh sampling."""
+    if not logger.isEnabledFor(level):
+        return False
+    return random.random() < (LOG_SAMPLE_RATE if rate is None else rate)
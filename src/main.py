@@ -1,13 +1,13 @@
 import os
 import time
-import pandas as pd
-from src.getData import load_and_save_normalized, save_campaign_recommendation, save_idea_recommendation
-from src.preprocessing import preprocess_dataframe
-from src.matching import filter_candidates_by_type
-from src.ruledBased import rule_based_match_improved
-from src.similarity import build_similarity_engine
-from src.ranking import combine_scores_improved
-from src.utils import normalize_tags
+from src.getData import RecommendationWriter
+from src.matching import MatchRequest, flush_recommendations, format_matches, match_challenges
+from src.snapshotStore import build_snapshot
+from src.retrieval import RETRIEVAL_TOP_K
+from src.parallel import MATCH_WORKERS
+from src.logger import fields, get_logger
+
+logger = get_logger("main")
 
 IDEAS_URL = os.environ.get("IDEAS_URL", "https://favbackend-dev.vercel.app/api/yos/ideas/list")
 CAMPAIGNS_URL = os.environ.get("CAMPAIGNS_URL", "https://favbackend-dev.vercel.app/api/yos/campaigns/list")
@@ -21,153 +21,56 @@ def process_recommendations_optimized(
     save_to_db=True,
     min_score=0.1,
     limit=10,
-    match_type="both"  # "campaigns", "ideas", or "both"
+    match_type="both",  # "campaigns", "ideas", or "both"
+    exhaustive=False,
+    shortlist_size=RETRIEVAL_TOP_K,
+    workers=MATCH_WORKERS
 ):
     """
     Optimized processing function that returns data in the requested JSON format
     """
     start_time = time.time()
     
-    print("🚀 Starting optimized recommendation pipeline...")
+    logger.info("🚀 Starting optimized recommendation pipeline...")
     
-    # 1. Load and preprocess data (single pass)
-    ideas, campaigns, challenges = load_and_save_normalized(ideas_url, campaigns_url, challenges_url)
-    ideas = preprocess_dataframe(ideas)
-    campaigns = preprocess_dataframe(campaigns)
-    challenges = preprocess_dataframe(challenges)
+    # 1. Ingest: load + save, preprocess, text index, similarity model (persisted, only refit when the corpus changes)
+    snapshot = build_snapshot(ideas_url, campaigns_url, challenges_url)
+    challenges, engine = snapshot.challenges, snapshot.engine
     
     # Filter specific challenge if requested
     if challenge_id:
-        challenges = challenges[challenges['id'] == challenge_id]
+        challenges, engine = snapshot.challenge(challenge_id)
         if challenges.empty:
             raise ValueError(f"Challenge {challenge_id} not found")
     
-    print(f"📊 Loaded: {len(ideas)} ideas, {len(campaigns)} campaigns, {len(challenges)} challenges")
-    
-    # 2. Build similarity engine (single pass)
-    all_candidates = pd.concat([ideas, campaigns], ignore_index=True)
-    engine = build_similarity_engine(all_candidates, challenges)
-    print("🔍 Similarity engine built")
+    logger.info("📊 Loaded data", extra=fields(
+        ideas=len(snapshot.ideas), campaigns=len(snapshot.campaigns), challenges=len(challenges),
+    ))
+    logger.info("🔍 Similarity engine ready (version %s)", engine.version)
     
-    # 3. Initialize results
-    campaign_matches = []
-    idea_matches = []
-    total_saved = 0
+    # 2. Only the requested entity types are matched, scored and saved
+    entity_types = {"ideas": ("idea",), "campaigns": ("campaign",)}.get(match_type, ("idea", "campaign"))
+    match_request = MatchRequest(
+        entity_types=entity_types,
+        limit=limit,
+        min_score=min_score,
+        engagement_fields=("votes", "supports"),
+        exhaustive=exhaustive,
+        shortlist_size=shortlist_size,
+        workers=workers,
+    )
     
-    # 4. Process each challenge
-    for _, ch_row in challenges.iterrows():
-        challenge = ch_row.to_dict()
-        cid = challenge.get("id")
-        
-        print(f"\n--- Processing challenge: {cid} | {challenge.get('title', '')[:50]}")
-        
-        # Get candidates
-        candidates = filter_candidates_by_type(challenge, ideas, campaigns)
-        if candidates.empty:
-            print("⚠️ No candidates found")
-            continue
-        
-        # Apply rule-based matching
-        matched = rule_based_match_improved(
-            challenge, 
-            candidates,
-            min_conditions_passed=1,
-            min_score_threshold=min_score
+    # 3. Process each challenge (fan out across worker processes when workers > 1), merged in challenge order.
+    # Recommendation rows are buffered and bulk-upserted in batches
+    writer = RecommendationWriter() if save_to_db else None
+    try:
+        challenge_results = match_challenges(
+            match_request, challenges, snapshot.views, engine,
+            text_index=snapshot.text_index, index_cache=snapshot.index_cache, writer=writer
         )
-        
-        if not matched:
-            print("⚠️ No matches after rule-based filtering")
-            continue
-        
-        print(f"✅ {len(matched)} candidates matched")
-        
-        # Prepare challenge text for similarity
-        challenge_text = " ".join([
-            str(challenge.get("title", "")),
-            str(challenge.get("description", "")),
-            " ".join(normalize_tags(challenge.get("tags", [])))
-        ])
-        
-        # Separate campaigns and ideas with scoring
-        campaign_recs = []
-        idea_recs = []
-        
-        for r in matched:
-            try:
-                candidate_text = " ".join([
-                    str(r["raw"].get("title", "")),
-                    str(r["raw"].get("description", "")),
-                    " ".join(normalize_tags(r["raw"].get("tags", [])))
-                ])
-                
-                # Calculate similarity score
-                sim_score = engine.compute(challenge_text, candidate_text)
-                
-                # Calculate engagement score
-                engagement = (r["raw"].get("votes", 0) or 0) + (r["raw"].get("supports", 0) or 0)
-                
-                # Calculate final score
-                final_score = combine_scores_improved(r["score"], sim_score, engagement)
-                
-                rec_data = {
-                    "id": r["id"],
-                    "rule_score": r["score"],
-                    "similarity_score": sim_score,
-                    "final_score": final_score,
-                    "raw": r["raw"]
-                }
-                
-                # Determine type based on presence of campaign-specific fields
-                is_campaign = any(field in r["raw"] for field in 
-                                ["trigger_type", "preorder_price", "supports"])
-                
-                if is_campaign:
-                    campaign_recs.append(rec_data)
-                else:
-                    idea_recs.append(rec_data)
-                
-                # Save to database if requested
-                if save_to_db:
-                    if is_campaign:
-                        if save_campaign_recommendation(cid, r["id"], r["score"], sim_score, final_score):
-                            total_saved += 1
-                    else:
-                        if save_idea_recommendation(cid, r["id"], r["score"], sim_score, final_score):
-                            total_saved += 1
-                            
-            except Exception as e:
-                print(f"    ❌ Error processing candidate {r.get('id', 'unknown')}: {e}")
-                continue
-        
-        # Sort by final score (descending)
-        campaign_recs.sort(key=lambda x: x["final_score"], reverse=True)
-        idea_recs.sort(key=lambda x: x["final_score"], reverse=True)
-        
-        # Create campaign matches in requested format
-        if (match_type in ["campaigns", "both"]) and campaign_recs:
-            limited_campaigns = campaign_recs[:limit]
-            campaign_match = {
-                "challengeId": cid,
-                "campaignIds": [r["id"] for r in limited_campaigns],
-                "similarityScore": [round(r["similarity_score"], 3) for r in limited_campaigns],
-                "ruleScore": [round(r["rule_score"], 3) for r in limited_campaigns],
-                "finalScore": [round(r["final_score"], 3) for r in limited_campaigns]
-            }
-            campaign_matches.append(campaign_match)
-            print(f"  📋 Campaign match created with {len(limited_campaigns)} recommendations")
-        
-        # Create idea matches in requested format  
-        if (match_type in ["ideas", "both"]) and idea_recs:
-            limited_ideas = idea_recs[:limit]
-            idea_match = {
-                "challengeId": cid,
-                "ideaIds": [r["id"] for r in limited_ideas],  # Fixed: was "ideasIds"
-                "similarityScore": [round(r["similarity_score"], 3) for r in limited_ideas],
-                "ruleScore": [round(r["rule_score"], 3) for r in limited_ideas],
-                "finalScore": [round(r["final_score"], 3) for r in limited_ideas]
-            }
-            idea_matches.append(idea_match)
-            print(f"  💡 Idea match created with {len(limited_ideas)} recommendations")
+    finally:
+        # Write remaining buffered recommendations, also when matching fails
+        write_summary = flush_recommendations(writer)
     
     # Calculate processing time
     processing_time = f"{int((time.time() - start_time) * 1000)}ms"
@@ -177,17 +80,17 @@ def process_recommendations_optimized(
         "processingTime": processing_time,
         "summary": {
             "challenges_processed": len(challenges),
-            "recommendations_saved": total_saved if save_to_db else "not_saved"
+            **write_summary
         }
     }
     
     if match_type == "campaigns":
-        results["matches"] = campaign_matches
+        results["matches"] = format_matches(challenge_results, "campaign")
     elif match_type == "ideas":
-        results["matches"] = idea_matches
+        results["matches"] = format_matches(challenge_results, "idea")
     else:  # both
-        results["campaign_matches"] = campaign_matches
-        results["idea_matches"] = idea_matches
+        results["campaign_matches"] = format_matches(challenge_results, "campaign")
+        results["idea_matches"] = format_matches(challenge_results, "idea")
     
     return results
 
@@ -195,8 +98,6 @@ def main():
     """
     Main function with optimized single-pass processing
     """
-    print("🚀 Starting optimized recommendation pipeline...")
-    
     try:
         # Process with both types
         results = process_recommendations_optimized(
@@ -246,7 +147,7 @@ def main():
         return results
         
     except Exception as e:
-        print(f"❌ Pipeline failed: {e}")
+        logger.exception("❌ Pipeline failed: %s", e)
         raise
 
 if __name__ == "__main__":
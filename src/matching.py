@@ -1,10 +1,281 @@
+"""
+Matching core yang dipakai semua route API dan CLI.
+
+MatchRequest menentukan entity type yang diminta, limit, threshold dan bobot
+skor. Entity type yang tidak diminta dibuang sebelum shortlist / rule matching /
+scoring, jadi /matches/ideas tidak pernah menghitung skor untuk campaigns.
+Type setiap candidate dibaca dari kolom categorical entity_type (lihat
+getData.tag_entity_type).
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
 import pandas as pd
 
-def filter_candidates_by_type(challenge: dict, ideas: pd.DataFrame, campaigns: pd.DataFrame) -> pd.DataFrame:
-    t = (challenge.get("type") or "both").lower()
+from src.getData import ENTITY_TYPES, tag_entity_type
+from src.logger import fields, get_logger
+from src.parallel import MATCH_WORKERS, imap_challenges
+from src.ranking import combine_scores_array, engagement_scores, top_k_indices, validate_weights
+from src.retrieval import RETRIEVAL_TOP_K, shortlist_candidates
+from src.ruledBased import rule_based_match_improved
+
+logger = get_logger("matching")
+
+
+def combine_candidates(ideas: pd.DataFrame, campaigns: pd.DataFrame) -> pd.DataFrame:
+    """Ideas + campaigns dalam satu frame (untuk challenge type "both")."""
+    if "entity_type" not in ideas.columns:
+        ideas = tag_entity_type(ideas.copy(), "idea")
+    if "entity_type" not in campaigns.columns:
+        campaigns = tag_entity_type(campaigns.copy(), "campaign")
+    if ideas.empty:
+        return _with_range_index(campaigns)
+    if campaigns.empty:
+        return _with_range_index(ideas)
+    return pd.concat([ideas, campaigns], ignore_index=True)
+
+
+def _with_range_index(df: pd.DataFrame) -> pd.DataFrame:
+    # reset_index selalu membuat copy; frame yang index-nya sudah 0..n-1 dipakai apa adanya
+    index = df.index
+    if isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1:
+        return df
+    return df.reset_index(drop=True)
+
+
+def challenge_type(challenge: dict) -> str:
+    """"idea", "campaign" atau "both" dari field type challenge (null / NaN / bukan string -> "both")."""
+    t = challenge.get("type")
+    t = t.lower() if isinstance(t, str) and t else "both"
     if t == "idea" or t == "ideas":
-        return ideas.reset_index(drop=True)
-    elif t == "campaign" or t == "campaigns" or t == "campaigns":
-        return campaigns.reset_index(drop=True)
-    else:
-        return pd.concat([ideas, campaigns], ignore_index=True).reset_index(drop=True)
+        return "idea"
+    elif t == "campaign" or t == "campaigns":
+        return "campaign"
+    return "both"
+
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum()) if len(df.columns) else 0
+
+
+class CandidateViews:
+    """
+    Candidate frame per challenge type ("idea", "campaign", "both"), dibuat sekali per snapshot.
+    Setiap challenge mendapat frame yang sama (read-only), jadi tidak ada reset_index / concat
+    (copy seluruh candidate table) per challenge.
+    """
+
+    TYPES = ("idea", "campaign", "both")
+
+    def __init__(self, ideas: pd.DataFrame, campaigns: pd.DataFrame, both: Optional[pd.DataFrame] = None):
+        if "entity_type" not in ideas.columns:
+            ideas = tag_entity_type(ideas.copy(), "idea")
+        if "entity_type" not in campaigns.columns:
+            campaigns = tag_entity_type(campaigns.copy(), "campaign")
+        self.frames: Dict[str, pd.DataFrame] = {
+            "idea": _with_range_index(ideas),
+            "campaign": _with_range_index(campaigns),
+            "both": both if both is not None else combine_candidates(ideas, campaigns),
+        }
+
+    def for_challenge(self, challenge: dict) -> pd.DataFrame:
+        return self.frames[challenge_type(challenge)]
+
+    def prune(self, entity_types: Sequence[str]) -> "CandidateViews":
+        """Views hanya untuk entity_types (type lain jadi frame kosong); frame dipakai ulang, tidak di-copy."""
+        if set(ENTITY_TYPES) <= set(entity_types):
+            return self
+        pruned = CandidateViews.__new__(CandidateViews)
+        empty = pd.DataFrame()
+        kept = [t for t in ENTITY_TYPES if t in entity_types]
+        pruned.frames = {t: self.frames[t] if t in kept else empty for t in ENTITY_TYPES}
+        pruned.frames["both"] = self.frames[kept[0]] if len(kept) == 1 else self.frames["both"]
+        return pruned
+
+    def memory_report(self, challenges: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+        """
+        Bytes per view dan total yang di-materialize (frame yang sama dihitung sekali).
+        Dengan challenges: bytes yang dulu di-copy per run (satu frame per challenge) vs sekarang.
+        """
+        view_bytes = {t: _frame_bytes(df) for t, df in self.frames.items()}
+        unique = {id(df): view_bytes[t] for t, df in self.frames.items()}
+        report = {
+            **{f"{t}_rows": len(df) for t, df in self.frames.items()},
+            **{f"{t}_bytes": view_bytes[t] for t in self.TYPES},
+            "materialized_bytes": sum(unique.values()),
+        }
+        if challenges is not None and "type" in challenges.columns and len(challenges):
+            types = challenges["type"].map(lambda t: challenge_type({"type": t}))
+            per_run = int(sum(view_bytes[t] * n for t, n in types.value_counts().items()))
+            report["per_run_copy_bytes_avoided"] = per_run
+        return report
+
+
+class MatchRequest:
+    """Parameter satu matching run (sama untuk semua challenge di run itu)."""
+
+    __slots__ = ("entity_types", "limit", "min_score", "min_conditions_passed", "weights",
+                 "engagement_fields", "exhaustive", "shortlist_size", "workers")
+
+    def __init__(self,
+                 entity_types: Sequence[str] = ENTITY_TYPES,
+                 limit: int = 10,
+                 min_score: float = 0.1,
+                 min_conditions_passed: int = 1,
+                 weights: Tuple[float, float, float] = (0.5, 0.3, 0.2),
+                 engagement_fields: Sequence[str] = ("votes", "supports"),
+                 exhaustive: bool = False,
+                 shortlist_size: int = RETRIEVAL_TOP_K,
+                 workers: int = MATCH_WORKERS):
+        entity_types = tuple(entity_types)
+        unknown = set(entity_types) - set(ENTITY_TYPES)
+        if unknown or not entity_types:
+            raise ValueError(f"entity_types must be a non-empty subset of {ENTITY_TYPES}, got {entity_types}")
+        validate_weights(*weights)
+        self.entity_types = entity_types
+        self.limit = limit
+        self.min_score = min_score
+        self.min_conditions_passed = min_conditions_passed
+        self.weights = tuple(weights)
+        self.engagement_fields = tuple(engagement_fields)
+        self.exhaustive = exhaustive
+        self.shortlist_size = shortlist_size
+        self.workers = workers
+
+    def wants(self, entity_type: str) -> bool:
+        return entity_type in self.entity_types
+
+
+def match_challenge(request: MatchRequest, challenge: Dict[str, Any], views: CandidateViews,
+                    engine, text_index=None, index_cache: Optional[dict] = None) -> Optional[Dict[str, Any]]:
+    """
+    Rule matching + scoring untuk satu challenge (tanpa DB write, aman di worker process).
+    views sudah di-prune sesuai request. Return None kalau tidak ada match.
+    """
+    cid = challenge.get("id")
+
+    candidates = views.for_challenge(challenge)
+    if candidates.empty:
+        logger.debug("⚠️ No candidates found", extra=fields(challenge_id=cid))
+        return None
+
+    # Top-K most similar candidates only, unless exhaustive mode is requested
+    if not request.exhaustive:
+        candidates = shortlist_candidates(candidates, engine, cid, request.shortlist_size, index_cache)
+
+    matched = rule_based_match_improved(
+        challenge,
+        candidates,
+        min_conditions_passed=request.min_conditions_passed,
+        min_score_threshold=request.min_score,
+        sort_results=False,
+        text_index=text_index
+    )
+    if not matched:
+        logger.debug("⚠️ No matches after rule-based filtering", extra=fields(challenge_id=cid, candidates=len(candidates)))
+        return None
+
+    recs = {}
+    to_save = []
+
+    # Engagement per candidate (non-numeric metrics are skipped)
+    scored, engagements = engagement_scores(matched, request.engagement_fields)
+    # Similarity scores: row lookup in the fitted document matrix (no re-tokenizing)
+    sim_scores = engine.compute_ids(cid, [r["id"] for r in scored])
+    # Final scores for the whole challenge in one vectorized pass
+    alpha, beta, gamma = request.weights
+    final_scores = combine_scores_array([r["score"] for r in scored], sim_scores, engagements,
+                                        alpha=alpha, beta=beta, gamma=gamma)
+    entity_types = np.array([r["raw"].get("entity_type") for r in scored], dtype=object)
+
+    # Split per type dengan mask; urutan candidate dipertahankan di setiap type
+    for entity_type in request.entity_types:
+        positions = np.flatnonzero(entity_types == entity_type)
+        for i in positions:
+            r = scored[i]
+            to_save.append((entity_type, r["id"], r["score"], float(sim_scores[i]), float(final_scores[i])))
+        # Top `limit` by final score (argpartition; tie -> candidate yang lebih dulu)
+        limit = len(positions) if request.limit is None else request.limit
+        recs[entity_type] = [{
+            "id": scored[i]["id"],
+            "rule_score": scored[i]["score"],
+            "similarity_score": float(sim_scores[i]),
+            "final_score": float(final_scores[i]),
+        } for i in positions[top_k_indices(final_scores[positions], limit)]]
+
+    logger.debug("✅ Challenge processed", extra=fields(
+        challenge_id=cid,
+        candidates=len(candidates),
+        matched=len(matched),
+        **{f"{entity_type}_recs": len(top) for entity_type, top in recs.items()},
+    ))
+    return {
+        "challenge_id": cid,
+        "matches": recs,
+        "to_save": to_save,
+    }
+
+
+def match_challenges(request: MatchRequest, challenges: pd.DataFrame, views: CandidateViews,
+                     engine, text_index=None, index_cache: Optional[dict] = None, writer=None) -> List[Dict[str, Any]]:
+    """
+    Jalankan match_challenge untuk semua challenges (fan out ke request.workers process),
+    lalu merge sesuai urutan challenge. Kalau writer diberikan (RecommendationWriter),
+    semua scored candidates dari type yang diminta di-buffer untuk disimpan begitu hasil
+    challenge-nya siap, jadi batch yang penuh sudah ditulis selagi matching masih jalan.
+    views: CandidateViews dari snapshot (lihat MatchingSnapshot.views).
+    """
+    # Prune type yang tidak diminta sebelum shortlist / rule / scoring
+    views = views.prune(request.entity_types)
+    if index_cache is None:
+        index_cache = {}
+
+    def run(challenge):
+        return match_challenge(request, challenge, views, engine, text_index, index_cache)
+
+    results = []
+    for result in imap_challenges(run, challenges.to_dict("records"), request.workers):
+        if result is None:
+            continue
+        if writer is not None:
+            cid = result["challenge_id"]
+            for entity_type, rec_id, rule_score, sim_score, final_score in result["to_save"]:
+                if entity_type == "campaign":
+                    writer.add_campaign(cid, rec_id, rule_score, sim_score, final_score)
+                else:
+                    writer.add_idea(cid, rec_id, rule_score, sim_score, final_score)
+        results.append(result)
+    return results
+
+
+def flush_recommendations(writer) -> Dict[str, Any]:
+    """
+    Flush writer (RecommendationWriter atau None) dan ringkas hasilnya untuk response:
+    recommendations_saved, plus recommendations_failed + errors kalau ada batch yang gagal.
+    """
+    if writer is None:
+        return {"recommendations_saved": "not_saved"}
+    stats = writer.flush()
+    summary = {"recommendations_saved": stats["saved"]}
+    if stats["failed"]:
+        summary["recommendations_failed"] = stats["failed"]
+        summary["errors"] = list(writer.errors)
+    return summary
+
+
+def format_matches(results: List[Dict[str, Any]], entity_type: str) -> List[Dict[str, Any]]:
+    """Response format per challenge: {challengeId, ideaIds|campaignIds, similarityScore, ruleScore, finalScore}."""
+    ids_key = "campaignIds" if entity_type == "campaign" else "ideaIds"
+    formatted = []
+    for result in results:
+        recs = result["matches"].get(entity_type)
+        if not recs:
+            continue
+        formatted.append({
+            "challengeId": result["challenge_id"],
+            ids_key: [r["id"] for r in recs],
+            "similarityScore": [round(r["similarity_score"], 3) for r in recs],
+            "ruleScore": [round(r["rule_score"], 3) for r in recs],
+            "finalScore": [round(r["final_score"], 3) for r in recs]
+        })
+    return formatted
@@ -0,0 +1,246 @@
+"""
+Persistent, versioned similarity model.
+
+Vocabulary/IDF dan document matrix dari SimilarityEngine disimpan ke disk
+(<version>.npz + <version>.json). Version = content hash dari corpus, jadi
+request berikutnya cukup load model yang sama. Kalau corpus berubah, model
+terakhir di-update secara incremental (entity baru/berubah/dihapus); full refit
+kalau belum ada model, delta kumulatif sejak fit terakhir terlalu besar, terlalu
+banyak token di luar vocabulary, atau lewat /model/rebuild.
+"""
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from src.logger import fields, get_logger
+from src.similarity import SimilarityEngine, corpus_documents
+
+logger = get_logger("modelStore")
+
+MODEL_DIR = os.environ.get("MODEL_DIR", os.path.join(tempfile.gettempdir(), "matching_model"))
+# Relative IDF drift sebelum incremental update melakukan full re-normalization
+IDF_DRIFT_THRESHOLD = float(os.environ.get("IDF_DRIFT_THRESHOLD", "0.1"))
+# Kalau porsi entity baru/berubah lebih besar dari ini, full refit lebih murah & akurat
+# (dihitung kumulatif sejak full fit terakhir, termasuk entity yang dihapus)
+INCREMENTAL_MAX_DELTA = float(os.environ.get("INCREMENTAL_MAX_DELTA", "0.5"))
+# Porsi token entity baru/berubah yang tidak ada di vocabulary; di atas ini full refit
+# (vocabulary incremental update tidak pernah bertambah)
+OOV_REFIT_THRESHOLD = float(os.environ.get("OOV_REFIT_THRESHOLD", "0.2"))
+# Jumlah versi model yang disimpan di disk
+MODEL_KEEP_VERSIONS = int(os.environ.get("MODEL_KEEP_VERSIONS", "3"))
+
+LATEST_FILE = "LATEST"
+
+# Engine yang terakhir dipakai di process ini (lazy, dishare antar request)
+_current = {"version": None, "engine": None}
+_lock = threading.Lock()
+
+
+def corpus_hash(ids: list, fingerprints: list[str]) -> str:
+    """Content hash (sha256, 16 hex) dari pasangan (id, fingerprint) corpus."""
+    h = hashlib.sha256()
+    for entity_id, fp in zip(ids, fingerprints):
+        h.update(str(entity_id).encode("utf-8"))
+        h.update(b"\0")
+        h.update(fp.encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()[:16]
+
+
+def _paths(version: str, model_dir: str) -> tuple[str, str]:
+    base = os.path.join(model_dir, version)
+    return base + ".npz", base + ".json"
+
+
+def _csr_arrays(prefix: str, matrix) -> dict:
+    matrix = matrix.tocsr()
+    return {
+        f"{prefix}_data": matrix.data,
+        f"{prefix}_indices": matrix.indices,
+        f"{prefix}_indptr": matrix.indptr,
+        f"{prefix}_shape": np.array(matrix.shape),
+    }
+
+
+def _csr_from(arrays, prefix: str):
+    return sparse.csr_matrix(
+        (arrays[f"{prefix}_data"], arrays[f"{prefix}_indices"], arrays[f"{prefix}_indptr"]),
+        shape=tuple(arrays[f"{prefix}_shape"]),
+    )
+
+
+def latest_version(model_dir: str = MODEL_DIR) -> Optional[str]:
+    try:
+        with open(os.path.join(model_dir, LATEST_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _prune(model_dir: str, keep: int):
+    """Hapus versi lama, sisakan `keep` versi terbaru."""
+    metas = sorted(glob.glob(os.path.join(model_dir, "*.json")), key=os.path.getmtime, reverse=True)
+    for json_path in metas[keep:]:
+        for path in (json_path, json_path[:-len(".json")] + ".npz"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def save_engine(engine: SimilarityEngine, version: str, model_dir: str = MODEL_DIR) -> str:
+    """Simpan engine yang sudah di-fit (dengan ids). Return path file .json."""
+    if not engine.fitted or engine.matrix is None:
+        raise RuntimeError("Only an engine fitted with ids can be saved.")
+
+    os.makedirs(model_dir, exist_ok=True)
+    npz_path, json_path = _paths(version, model_dir)
+
+    # Tulis ke file sementara lalu os.replace supaya reader tidak pernah lihat file setengah jadi
+    tmp_npz = npz_path + ".tmp.npz"
+    np.savez(
+        tmp_npz,
+        idf=engine.idf,
+        df=engine.df,
+        **_csr_arrays("matrix", engine.matrix),
+        **_csr_arrays("counts", engine.counts),
+    )
+    os.replace(tmp_npz, npz_path)
+
+    meta = {
+        "version": version,
+        "max_features": engine.vectorizer.max_features,
+        "n_docs": int(engine.n_docs),
+        "vocabulary": {term: int(col) for term, col in engine.vectorizer.vocabulary_.items()},
+        "ids": engine.ids,
+        "fingerprints": [engine.fingerprints.get(entity_id) for entity_id in engine.ids],
+        "delta_since_fit": int(engine.delta_since_fit),
+    }
+    tmp_json = json_path + ".tmp"
+    with open(tmp_json, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_json, json_path)
+
+    tmp_latest = os.path.join(model_dir, LATEST_FILE + ".tmp")
+    with open(tmp_latest, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_latest, os.path.join(model_dir, LATEST_FILE))
+
+    _prune(model_dir, MODEL_KEEP_VERSIONS)
+    return json_path
+
+
+def load_engine(version: str, model_dir: str = MODEL_DIR) -> Optional[SimilarityEngine]:
+    """Load engine untuk version tertentu, atau None kalau belum ada / rusak."""
+    npz_path, json_path = _paths(version, model_dir)
+    if not (os.path.exists(npz_path) and os.path.exists(json_path)):
+        return None
+
+    try:
+        with open(json_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        with np.load(npz_path) as arrays:
+            idf = arrays["idf"]
+            df = arrays["df"]
+            matrix = _csr_from(arrays, "matrix")
+            counts = _csr_from(arrays, "counts")
+
+        if meta.get("version") != version or matrix.shape[0] != len(meta["ids"]):
+            return None
+
+        engine = SimilarityEngine(max_features=meta.get("max_features"),
+                                  drift_threshold=IDF_DRIFT_THRESHOLD)
+        engine.vectorizer.vocabulary_ = meta["vocabulary"]
+        engine.idf = idf
+        engine.df = df
+        engine.n_docs = meta["n_docs"]
+        engine.counts = counts
+        engine.matrix = matrix
+        engine.ids = meta["ids"]
+        engine.index = {entity_id: row for row, entity_id in enumerate(engine.ids)}
+        engine.fingerprints = dict(zip(engine.ids, meta["fingerprints"]))
+        engine.delta_since_fit = meta.get("delta_since_fit", 0)
+        engine.version = version
+        engine.fitted = True
+        return engine
+    except Exception as e:
+        logger.warning("⚠️ Failed to load similarity model %s: %s", version, e)
+        return None
+
+
+def get_similarity_engine(candidates: pd.DataFrame, challenges: pd.DataFrame,
+                          force_rebuild: bool = False,
+                          model_dir: str = MODEL_DIR,
+                          text_index=None) -> SimilarityEngine:
+    """
+    Return engine untuk corpus ini.
+    Urutan: engine in-memory dengan version sama -> model di disk dengan version sama
+    -> incremental update dari model terakhir -> full refit (lalu disimpan).
+    text_index (opsional): TextIndex dari load ini, supaya dokumen tidak di-tokenize ulang.
+    """
+    ids, texts, fingerprints = corpus_documents(candidates, challenges, text_index)
+    version = corpus_hash(ids, fingerprints)
+
+    with _lock:
+        if not force_rebuild and _current["version"] == version:
+            return _current["engine"]
+
+        engine = None
+        if not force_rebuild:
+            engine = load_engine(version, model_dir)
+            if engine is not None:
+                logger.info("📦 Loaded similarity model", extra=fields(version=version))
+            else:
+                base = _current["engine"]
+                if base is None:
+                    previous = latest_version(model_dir)
+                    base = load_engine(previous, model_dir) if previous else None
+                if base is not None:
+                    # Baru/berubah + dihapus, ditambah delta update sebelumnya sejak full fit terakhir
+                    current = set(ids)
+                    n_delta = sum(1 for entity_id, fp in zip(ids, fingerprints)
+                                  if base.fingerprints.get(entity_id) != fp)
+                    n_delta += sum(1 for entity_id in base.ids if entity_id not in current)
+                    if base.delta_since_fit + n_delta > INCREMENTAL_MAX_DELTA * len(ids):
+                        logger.info("🔧 Delta since last fit too large, refitting", extra=fields(
+                            base_version=base.version, delta=base.delta_since_fit + n_delta, documents=len(ids)))
+                        base = None
+                if base is not None:
+                    # copy() supaya engine lama tetap utuh untuk request yang sedang jalan
+                    engine = base.copy()
+                    engine.drift_threshold = IDF_DRIFT_THRESHOLD
+                    stats = engine.update(texts, ids, fingerprints)
+                    logger.info("♻️ Incremental similarity update", extra=fields(
+                        base_version=base.version, version=version, added=stats["added"], changed=stats["changed"],
+                        removed=stats["removed"], oov_share=round(stats["oov_share"], 3),
+                        drift=round(stats["drift"], 3), renormalized=stats["renormalized"]))
+                    if stats["oov_share"] > OOV_REFIT_THRESHOLD:
+                        # Banyak term baru yang tidak terwakili di vocabulary lama
+                        logger.info("🔧 Too many out-of-vocabulary tokens, refitting", extra=fields(
+                            oov_share=round(stats["oov_share"], 3), threshold=OOV_REFIT_THRESHOLD))
+                        engine = None
+
+        if engine is None:
+            engine = SimilarityEngine(drift_threshold=IDF_DRIFT_THRESHOLD)
+            engine.fit(texts, ids=ids, fingerprints=fingerprints)
+            logger.info("🔧 Fitted similarity model", extra=fields(version=version, documents=len(ids)))
+
+        if engine.version != version:
+            engine.version = version
+            try:
+                save_engine(engine, version, model_dir)
+            except OSError as e:
+                # Model tetap bisa dipakai walaupun disk tidak writable
+                logger.warning("⚠️ Could not persist similarity model %s: %s", version, e)
+
+        _current["version"] = version
+        _current["engine"] = engine
+        return engine
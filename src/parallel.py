@@ -0,0 +1,93 @@
+"""
+Parallel per-challenge processing.
+
+Setiap challenge independen setelah engine dan candidate frames siap, jadi
+challenges bisa di-fan-out ke beberapa process. Worker dibuat dengan fork:
+engine, DataFrame dan text index diwarisi copy-on-write (tidak di-pickle),
+yang dikirim ke worker hanya (call id, index challenge). Hasil dikembalikan sesuai urutan
+input sehingga merge (dan DB save di parent) deterministik.
+"""
+import itertools
+import multiprocessing
+import os
+import threading
+from typing import Any, Callable, Iterator, List, Tuple
+
+from src.logger import get_logger
+
+logger = get_logger("parallel")
+
+# Jumlah worker process default (1 = serial)
+MATCH_WORKERS = int(os.environ.get("MATCH_WORKERS", "1"))
+
+# State yang diwarisi worker lewat fork: call id -> (fn, items). Per call supaya worker yang
+# di-respawn pool (fork ulang dari parent) tetap menemukan state call-nya walaupun ada
+# request lain yang jalan bersamaan.
+_shared = {}
+_calls = itertools.count()
+_fork_lock = threading.Lock()
+
+
+def _run(task: Tuple[int, int]):
+    call, position = task
+    fn, items = _shared[call]
+    return fn(items[position])
+
+
+def fork_available() -> bool:
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def map_challenges(fn: Callable[[Any], Any], items: List[Any], workers: int = MATCH_WORKERS) -> List[Any]:
+    """
+    [fn(item) for item in items], dengan `workers` process kalau workers > 1.
+    fn boleh closure (tidak di-pickle); hasilnya harus picklable.
+    Tanpa fork (mis. Windows) atau untuk satu item, jalan serial. Jumlah worker dibatasi
+    ke jumlah CPU.
+    """
+    return list(imap_challenges(fn, items, workers))
+
+
+def imap_challenges(fn: Callable[[Any], Any], items: List[Any], workers: int = MATCH_WORKERS) -> Iterator[Any]:
+    """
+    Seperti map_challenges, tapi hasil di-yield satu per satu (urutan input) begitu siap,
+    jadi caller bisa memproses hasil awal (mis. DB write) selagi challenge lain masih jalan.
+    """
+    workers = min(int(workers or 1), len(items), os.cpu_count() or 1)
+    if workers <= 1:
+        yield from (fn(item) for item in items)
+        return
+    if not fork_available():
+        logger.warning("⚠️ fork start method not available, processing %d challenges serially", len(items))
+        yield from (fn(item) for item in items)
+        return
+    if multiprocessing.parent_process() is not None:
+        # Nested call dari dalam worker: jangan fork lagi
+        yield from (fn(item) for item in items)
+        return
+
+    # State harus ada selama pool hidup (pool bisa fork ulang worker), dihapus setelah join
+    call = next(_calls)
+    with _fork_lock:
+        _shared[call] = (fn, items)
+        try:
+            pool = multiprocessing.get_context("fork").Pool(workers)
+        except BaseException:
+            del _shared[call]
+            raise
+
+    chunksize = max(1, len(items) // (workers * 4))
+    completed = False
+    try:
+        # imap() mempertahankan urutan input -> merge deterministik
+        yield from pool.imap(_run, ((call, position) for position in range(len(items))), chunksize=chunksize)
+        completed = True
+    finally:
+        # Error atau generator ditutup lebih awal: worker dihentikan, bukan ditunggu
+        if completed:
+            pool.close()
+        else:
+            pool.terminate()
+        pool.join()
+        with _fork_lock:
+            _shared.pop(call, None)
@@ -1,6 +1,145 @@
+import heapq
+import math
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
 # For the pure rule-based pipeline ranking is done in rule_based.py (score = passed/total)
 # This module can host additional ranking heuristics later (e.g. boost by votes or tag-overlap).
 
+def _rank_score(score):
+    # NaN tidak bisa dibandingkan, taruh paling bawah supaya urutan tetap deterministik.
+    # Key berupa tuple (mis. (rule_score, engagement)) dibandingkan per elemen.
+    if isinstance(score, tuple):
+        return tuple(_rank_score(s) for s in score)
+    score = float(score)
+    return -math.inf if math.isnan(score) else score
+
+
+class TopK:
+    """
+    Streaming bounded top-k (min-heap berukuran k), O(n log k).
+    Urutan hasil sama dengan sorted(..., reverse=True)[:k] yang stable:
+    skor desc, skor sama -> item yang lebih dulu di-push menang.
+    k=None berarti tidak dibatasi.
+    """
+
+    def __init__(self, k: Optional[int]):
+        self.k = k
+        self._heap = []
+        self._seq = 0
+
+    def push(self, score, item: Any):
+        if self.k is not None and self.k <= 0:
+            return
+        entry = (_rank_score(score), -self._seq, item)
+        self._seq += 1
+        if self.k is None or len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def items(self) -> List[Any]:
+        """Item top-k, urut skor tertinggi dulu."""
+        return [item for _, _, item in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
+
+
+def top_k(items: Iterable[Any], k: Optional[int], key: Callable[[Any], Any]) -> List[Any]:
+    """Bounded top-k dari iterable, ekuivalen sorted(items, key=key, reverse=True)[:k]."""
+    selector = TopK(k)
+    for item in items:
+        selector.push(key(item), item)
+    return selector.items()
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Index top-k dari array skor via argpartition (O(n) + O(k log k)).
+    Urut skor desc, tie -> index kecil dulu, NaN paling bawah.
+    """
+    scores = np.where(np.isnan(scores), -np.inf, np.asarray(scores, dtype=float))
+    n = len(scores)
+    k = max(0, min(k, n))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < n:
+        kth = np.partition(scores, n - k)[n - k]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:k - len(above)]
+        selected = np.concatenate([above, ties])
+    else:
+        selected = np.arange(n)
+    return selected[np.lexsort((selected, -scores[selected]))]
+
+
+# Normalizer engagement -> [0, 1]; "linear" sama dengan combine_scores_improved
+ENGAGEMENT_NORMALIZERS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "linear": lambda e: np.minimum(e / 100.0, 1.0),  # assuming max 100 votes/comments
+    "log": lambda e: np.minimum(np.log1p(np.maximum(e, 0.0)) / np.log1p(100.0), 1.0),
+}
+
+
+def validate_weights(alpha: float, beta: float, gamma: float):
+    if abs(alpha + beta + gamma - 1.0) > 0.01:
+        raise ValueError("alpha + beta + gamma must equal 1.0")
+
+
+def engagement_score(raw: Dict[str, Any], fields=("votes", "supports")) -> float:
+    """Jumlah metric engagement dari raw candidate (None/NaN/0 dianggap 0)."""
+    total = 0
+    for field in fields:
+        value = raw.get(field, 0) or 0
+        if isinstance(value, float) and math.isnan(value):
+            # Kolom yang tidak dimiliki entity ini (mis. supports untuk idea setelah concat)
+            value = 0
+        total = total + value
+    return total
+
+
+def engagement_scores(matches: List[Dict[str, Any]], fields=("votes", "supports")) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """
+    Engagement untuk setiap rule match (pakai match["raw"]).
+    Match dengan metric non-numerik dilewati; return (matches yang dipakai, engagement array).
+    """
+    kept, values = [], []
+    for match in matches:
+        try:
+            values.append(float(engagement_score(match["raw"], fields)))
+        except (TypeError, ValueError):
+            continue
+        kept.append(match)
+    return kept, np.array(values, dtype=float)
+
+
+def combine_scores_array(rule_scores, similarity_scores, engagement_scores=None,
+                         alpha: float = 0.5, beta: float = 0.3, gamma: float = 0.2,
+                         normalizer: Union[str, Callable[[np.ndarray], np.ndarray]] = "linear") -> np.ndarray:
+    """
+    Versi array dari combine_scores_improved untuk satu challenge (1-D) atau
+    semua challenge sekaligus (2-D / broadcast). Bobot divalidasi sekali per call.
+    Dengan normalizer "linear" hasilnya identik dengan versi scalar.
+    """
+    validate_weights(alpha, beta, gamma)
+    normalize = ENGAGEMENT_NORMALIZERS[normalizer] if isinstance(normalizer, str) else normalizer
+    
+    rule_scores = np.asarray(rule_scores, dtype=float)
+    similarity_scores = np.asarray(similarity_scores, dtype=float)
+    if engagement_scores is None:
+        engagement_scores = np.zeros(np.broadcast(rule_scores, similarity_scores).shape)
+    normalized_engagement = normalize(np.asarray(engagement_scores, dtype=float))
+    
+    final_scores = (
+        alpha * rule_scores +
+        beta * similarity_scores +
+        gamma * normalized_engagement
+    )
+    
+    return np.minimum(final_scores, 1.0)  # Cap at 1.0
+
+
 def combine_scores_improved(rule_score: float, similarity_score: float, 
                           engagement_score: float = 0.0,
                           alpha: float = 0.5, beta: float = 0.3, gamma: float = 0.2) -> float:
@@ -8,8 +147,7 @@ def combine_scores_improved(rule_score: float, similarity_score: float,
     Enhanced scoring yang memperhitungkan rule, similarity, dan engagement
     alpha + beta + gamma harus = 1.0
     """
-    if abs(alpha + beta + gamma - 1.0) > 0.01:
-        raise ValueError("alpha + beta + gamma must equal 1.0")
+    validate_weights(alpha, beta, gamma)
     
     # Normalize engagement score (0-1 range)
     normalized_engagement = min(engagement_score / 100.0, 1.0)  # assuming max 100 votes/comments
@@ -20,4 +158,4 @@ def combine_scores_improved(rule_score: float, similarity_score: float,
         gamma * normalized_engagement
     )
     
-    return min(final_score, 1.0)  # Cap at 1.0
\ No newline at end of file
+    return min(final_score, 1.0)  # Cap at 1.0
@@ -0,0 +1,125 @@
+"""
+Top-K candidate retrieval di atas document matrix SimilarityEngine.
+
+Inverted index (term -> postings dokumen + bobot) dengan upper bound per term.
+Query dijalankan term-at-a-time dengan dynamic pruning ala WAND/MaxScore: begitu
+sisa upper bound term yang belum diproses lebih kecil dari skor ke-K saat ini,
+dokumen baru tidak mungkin masuk top-K sehingga hanya dokumen yang sudah jadi
+kandidat yang di-update. Hasilnya top-K exact tanpa scoring seluruh corpus.
+"""
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Ukuran shortlist default per challenge (0 = exhaustive)
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", "500"))
+
+
+class RetrievalIndex:
+    def __init__(self, engine, ids: list):
+        """Bangun inverted index untuk subset dokumen `ids` dari engine (urutan dipertahankan)."""
+        rows = engine.rows(ids)
+        self.positions = np.flatnonzero(rows >= 0)  # posisi di `ids` yang ada di engine
+        self.size = len(ids)
+
+        postings = engine.matrix[rows[self.positions]].tocsc()
+        postings.sort_indices()
+        self.indptr = postings.indptr
+        self.docs = postings.indices    # index ke self.positions
+        self.weights = postings.data
+
+        # Upper bound per term = bobot maksimum di postings term tsb
+        self.max_weight = np.zeros(postings.shape[1])
+        nonempty = np.diff(self.indptr) > 0
+        if nonempty.any():
+            self.max_weight[nonempty] = np.maximum.reduceat(self.weights, self.indptr[:-1][nonempty])
+
+    def top_k(self, query, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return (positions, scores) top-k dokumen untuk query vector (1 x n_terms, L2-normalized).
+        Positions adalah index ke `ids` saat index dibangun, urut skor desc (tie: posisi asc).
+        Kalau dokumen dengan skor > 0 kurang dari k, sisanya diisi dokumen skor 0 sesuai urutan.
+        """
+        n_docs = len(self.positions)
+        k = min(k, self.size)
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        query = query.tocsr()
+        terms = query.indices
+        upper = query.data * self.max_weight[terms]
+        order = np.argsort(-upper, kind="stable")
+        terms, q_weights, upper = terms[order], query.data[order], upper[order]
+        # remaining[i] = upper bound skor dari term i sampai akhir
+        remaining = np.cumsum(upper[::-1])[::-1]
+
+        scores = np.zeros(n_docs)
+        touched = np.zeros(n_docs, dtype=bool)
+        n_touched = 0
+        threshold = 0.0
+
+        for i, term in enumerate(terms):
+            start, end = self.indptr[term], self.indptr[term + 1]
+            if start == end:
+                continue
+            docs = self.docs[start:end]
+            contrib = self.weights[start:end] * q_weights[i]
+
+            if n_touched >= k and remaining[i] < threshold:
+                # Non-essential term: hanya update dokumen yang sudah jadi kandidat
+                known = touched[docs]
+                scores[docs[known]] += contrib[known]
+            else:
+                scores[docs] += contrib
+                n_touched += int((~touched[docs]).sum())
+                touched[docs] = True
+
+            if n_touched >= k:
+                threshold = np.partition(scores[touched], -k)[-k]
+
+        hits = np.flatnonzero(touched)
+        ranked = hits[np.lexsort((hits, -scores[hits]))][:k]
+        top_scores = scores[ranked]
+        top_positions = self.positions[ranked]
+
+        if len(top_positions) < k:
+            # Pad dengan dokumen skor 0 (termasuk yang tidak ada di engine) sesuai urutan
+            taken = np.zeros(self.size, dtype=bool)
+            taken[top_positions] = True
+            pad = np.flatnonzero(~taken)[:k - len(top_positions)]
+            top_positions = np.concatenate([top_positions, pad])
+            top_scores = np.concatenate([top_scores, np.zeros(len(pad))])
+
+        return top_positions, top_scores
+
+
+def shortlist_candidates(candidates: pd.DataFrame, engine, challenge_id, k: int = RETRIEVAL_TOP_K,
+                         index_cache: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Batasi candidates ke top-k paling mirip dengan challenge sebelum rule evaluation.
+    k <= 0, challenge tidak ada di engine, atau candidates <= k -> candidates apa adanya.
+    index_cache (dict) dipakai ulang antar challenge dengan candidate frame yang sama (frame
+    tidak boleh diubah in-place selama cache dipakai).
+    """
+    if k <= 0 or len(candidates) <= k or "id" not in candidates.columns:
+        return candidates
+    query = engine.query_vector(challenge_id)
+    if query is None:
+        return candidates
+
+    # Key = identitas frame (views per snapshot dipakai ulang), bukan tuple ids yang O(n) per challenge.
+    # Frame ikut disimpan supaya id() tidak bisa dipakai ulang oleh frame lain selama entry ada.
+    key = (engine.version, id(candidates))
+    cached = index_cache.get(key) if index_cache is not None else None
+    if cached is not None and cached[0] is candidates:
+        index = cached[1]
+    else:
+        index = RetrievalIndex(engine, candidates["id"].tolist())
+        if index_cache is not None:
+            index_cache[key] = (candidates, index)
+
+    positions, _ = index.top_k(query, k)
+    # Urutan asli dipertahankan supaya tie-breaking ranking sama dengan mode exhaustive
+    return candidates.iloc[np.sort(positions)].reset_index(drop=True)
@@ -1,7 +1,16 @@
+import logging
 import operator
 import re
-from typing import Any, Dict, List
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
 import pandas as pd
+from src.ranking import top_k
+from src.keywords import KeywordMatcher
+from src.textIndex import rule_text
+from src.logger import fields, get_logger, sampled
+
+logger = get_logger("ruledBased")
 
 # map operators to functions
 OPS = {
@@ -15,6 +24,68 @@ OPS = {
     "contains": lambda a, b: str(b).lower() in str(a).lower(),
 }
 
+# common aliases
+FIELD_ALIASES = {
+    "supervotes": ["superVotes", "supervotes", "super_vote", "super_vote_count"],
+    "votes": ["votes", "vote", "voters"],
+    "feedbacks": ["feedbacks", "comments", "responses"],
+    "supports": ["supports", "support", "supporters"],
+    "title": ["title", "name"],
+    "description": ["description", "desc", "content"],
+}
+
+
+class FieldResolver:
+    """
+    Resolver logical field -> kolom untuk satu schema (urutan kolom candidates).
+    Lowercase map dibuat sekali, hasil resolve (exact, case-insensitive, aliases)
+    di-memoize per field; field yang tidak ada ter-resolve ke None (nilai default 0).
+    """
+
+    def __init__(self, columns: tuple):
+        self.columns = columns
+        self._keys = set(columns)
+        self._lower_map = {k.lower(): k for k in columns if isinstance(k, str)}
+        self._resolved = {}
+
+    def resolve(self, field: str):
+        try:
+            return self._resolved[field]
+        except KeyError:
+            pass
+        key = self._lookup(field)
+        self._resolved[field] = key
+        if key is None:
+            # Sekali per (field, schema) supaya log tidak banjir
+            logger.warning("⚠️ Field '%s' not found in candidates. Available fields: %s", field, list(self.columns))
+        return key
+
+    def _lookup(self, field: str):
+        if field in self._keys:
+            return field
+        if not isinstance(field, str):
+            return None
+        
+        # try case-insensitive
+        lower_field = field.lower()
+        if lower_field in self._lower_map:
+            return self._lower_map[lower_field]
+
+        alias_keys = FIELD_ALIASES.get(lower_field, [])
+        for k in alias_keys:
+            if k in self._keys:
+                return k
+            if k.lower() in self._lower_map:
+                return self._lower_map[k.lower()]
+        return None
+
+
+@lru_cache(maxsize=256)
+def field_resolver(columns: tuple) -> FieldResolver:
+    """FieldResolver (memoized) untuk schema `columns`."""
+    return FieldResolver(columns)
+
+
 def _get_candidate_value(candidate: Dict[str, Any], field: str):
     """Try several fallbacks to read a field in candidate dict/row.
     Handles case differences and common alternative names.
@@ -22,31 +93,11 @@ def _get_candidate_value(candidate: Dict[str, Any], field: str):
     if field in candidate:
         return candidate[field]
     
-    # try case-insensitive
-    lower_map = {k.lower(): k for k in candidate.keys()}
-    if field.lower() in lower_map:
-        return candidate[lower_map[field.lower()]]
-
-    # common aliases
-    aliases = {
-        "supervotes": ["superVotes", "supervotes", "super_vote", "super_vote_count"],
-        "votes": ["votes", "vote", "voters"],
-        "feedbacks": ["feedbacks", "comments", "responses"],
-        "supports": ["supports", "support", "supporters"],
-        "title": ["title", "name"],
-        "description": ["description", "desc", "content"],
-    }
-    
-    for canon, keys in aliases.items():
-        if field.lower() == canon:
-            for k in keys:
-                if k in candidate:
-                    return candidate[k]
-                if k.lower() in lower_map:
-                    return candidate[lower_map[k.lower()]]
+    key = field_resolver(tuple(candidate.keys())).resolve(field)
+    if key is not None:
+        return candidate[key]
     
     # fallback 0 or empty
-    print(f"⚠️ Field '{field}' not found in candidate. Available fields: {list(candidate.keys())}")
     return 0
 
 
@@ -56,104 +107,352 @@ def _text_contains_any_all(text, words, operator_mode="any"):
         return False
         
     text_lower = str(text).lower()
-    words = [str(w).lower().strip() for w in words if w]
+    matcher = KeywordMatcher(str(w).lower().strip() for w in words if w)
+    return matcher.contains(text_lower, match_all=(operator_mode == "all"))
 
-    if operator_mode == "all":
-        return all(w in text_lower for w in words if w)
-    else:  # default = any
-        return any(w in text_lower for w in words if w)
 
+def _never(candidate: Dict[str, Any]) -> bool:
+    return False
 
-def evaluate_condition(condition: Dict[str, Any], candidate: Dict[str, Any]) -> bool:
-    """Evaluate a single condition against a candidate"""
-    try:
-        kind = condition.get("kind")
-        print(f"  Evaluating condition: {condition}")
+
+def _compile_accessor(field: str, columns=None) -> Callable[[Dict[str, Any]], Any]:
+    """Accessor untuk `field`. Kalau kolom candidates diketahui, key di-resolve sekali di sini."""
+    if columns is None:
+        return lambda candidate: candidate[field] if field in candidate else _get_candidate_value(candidate, field)
+    
+    key = field_resolver(tuple(columns)).resolve(field)
+    if key is None:
+        return lambda candidate: 0
+    return lambda candidate: candidate[key]
+
+
+def compile_condition(condition: Dict[str, Any], columns=None) -> Callable[[Dict[str, Any]], bool]:
+    """
+    Compile satu condition menjadi check(candidate) -> bool.
+    Operator, target value, word list (lowercase) dan field accessor di-resolve sekali;
+    hasilnya sama dengan evaluate_condition (error -> False).
+    """
+    kind = condition.get("kind")
+    
+    if kind == "numeric":
+        field = condition.get("field")
+        op_str = condition.get("operator")
         
-        if kind == "numeric":
-            field = condition.get("field")
-            op_str = condition.get("operator")
-            target_value = condition.get("value", 0)
-            
-            if not op_str or not field:
-                print(f"    Missing operator ({op_str}) or field ({field})")
-                return False
-                
-            op_func = OPS.get(op_str)
-            if not op_func:
-                print(f"    Unknown operator: {op_str}")
-                return False
-                
-            candidate_value = _get_candidate_value(candidate, field)
-            
+        if not op_str or not field:
+            return _never
+        op_func = OPS.get(op_str)
+        if not op_func:
+            return _never
+        try:
+            target_num = float(condition.get("value", 0))
+        except (ValueError, TypeError):
+            return _never
+        get_value = _compile_accessor(field, columns)
+        
+        def check_numeric(candidate):
             try:
+                candidate_value = get_value(candidate)
                 candidate_num = float(candidate_value) if candidate_value is not None else 0
-                target_num = float(target_value)
-            except (ValueError, TypeError):
-                print(f"    Cannot convert to numbers: candidate='{candidate_value}', target='{target_value}'")
-                return False
-                
-            result = op_func(candidate_num, target_num)
-            print(f"    Numeric: {candidate_num} {op_str} {target_num} = {result}")
-            return result
-
-        elif kind == "words":
-            words = condition.get("words", [])
-            operator_mode = condition.get("operator", "any")
-            
-            if not words:
-                print("    No words specified")
+                return op_func(candidate_num, target_num)
+            except Exception:
                 return False
-                
-            # Combine title, description, and tags
-            candidate_text_parts = []
-            
-            title = candidate.get("title", "")
-            if title:
-                candidate_text_parts.append(str(title))
-                
-            description = candidate.get("description", "")
-            if description:
-                candidate_text_parts.append(str(description))
-                
-            tags = candidate.get("tags", [])
-            if isinstance(tags, list):
-                candidate_text_parts.extend([str(tag) for tag in tags])
-            elif isinstance(tags, str):
-                candidate_text_parts.append(tags)
-                
-            combined_text = " ".join(candidate_text_parts)
-            
-            result = _text_contains_any_all(combined_text, words, operator_mode)
-            print(f"    Words: '{words}' in '{combined_text[:100]}...' (mode={operator_mode}) = {result}")
-            return result
-            
-        elif kind == "field":
-            # Direct field comparison
-            field = condition.get("field")
-            op_str = condition.get("operator", "=")
-            target_value = condition.get("value")
-            
-            if not field:
+        return check_numeric
+    
+    if kind == "words":
+        words = condition.get("words", [])
+        if not words:
+            return _never
+        match_all = condition.get("operator", "any") == "all"
+        try:
+            matcher = KeywordMatcher(str(w).lower().strip() for w in words if w)
+        except Exception:
+            return _never
+        
+        def check_words(candidate):
+            try:
+                text_lower = rule_text(candidate).lower()
+                if not text_lower:
+                    return False
+                return matcher.contains(text_lower, match_all=match_all)
+            except Exception:
                 return False
-                
-            candidate_value = _get_candidate_value(candidate, field)
-            op_func = OPS.get(op_str)
-            
-            if not op_func:
+        return check_words
+    
+    if kind == "field":
+        # Direct field comparison
+        field = condition.get("field")
+        op_func = OPS.get(condition.get("operator", "="))
+        
+        if not field or not op_func:
+            return _never
+        target_lower = str(condition.get("value")).lower()
+        get_value = _compile_accessor(field, columns)
+        
+        def check_field(candidate):
+            try:
+                return op_func(str(get_value(candidate)).lower(), target_lower)
+            except Exception:
                 return False
-                
-            result = op_func(str(candidate_value).lower(), str(target_value).lower())
-            print(f"    Field: {field} ({candidate_value}) {op_str} {target_value} = {result}")
-            return result
-            
+        return check_field
+    
+    return _never
+
+
+_VECTOR_OPS = {operator.ge, operator.gt, operator.le, operator.lt, operator.eq, operator.ne}
+
+
+def _apply_op(op_func, values: np.ndarray, target) -> np.ndarray:
+    """Operator ke satu kolom sekaligus; operator lain (mis. contains) per element."""
+    if op_func in _VECTOR_OPS:
+        with np.errstate(invalid="ignore"):
+            return np.asarray(op_func(values, target), dtype=bool)
+    return np.fromiter((bool(op_func(v, target)) for v in values), dtype=bool, count=len(values))
+
+
+def _to_float(value):
+    # Sama dengan konversi di compile_condition: None -> 0, gagal -> invalid
+    if value is None:
+        return 0.0, True
+    try:
+        return float(value), True
+    except (ValueError, TypeError):
+        return np.nan, False
+
+
+class CandidateColumns:
+    """
+    Kolom turunan dari candidates DataFrame (float column, lowercase string column,
+    combined text) yang dihitung sekali dan dipakai ulang oleh semua conditions.
+    """
+
+    def __init__(self, candidates_df: pd.DataFrame, text_index=None):
+        self.df = candidates_df
+        self.text_index = text_index
+        self.n = len(candidates_df)
+        self._numeric = {}
+        self._lowered = {}
+        self._text_lower = None
+        self._nonempty_text = None
+        self._keyword_hits = {}
+        self._records = None
+
+    def numeric(self, key) -> tuple:
+        """(values float array, valid mask) untuk kolom `key`."""
+        if key not in self._numeric:
+            series = self.df[key]
+            if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+                if isinstance(series.dtype, np.dtype):
+                    values = series.to_numpy(dtype=float)
+                else:
+                    # pd.NA (nullable dtype) jadi None di row dict -> dianggap 0
+                    values = series.to_numpy(dtype=float, na_value=0.0)
+                valid = np.ones(self.n, dtype=bool)
+            else:
+                pairs = [_to_float(v) for v in series.tolist()]
+                values = np.array([v for v, _ in pairs], dtype=float)
+                valid = np.array([ok for _, ok in pairs], dtype=bool)
+            self._numeric[key] = (values, valid)
+        return self._numeric[key]
+
+    def lowered(self, key) -> np.ndarray:
+        """str(value).lower() untuk setiap row kolom `key`."""
+        if key not in self._lowered:
+            # to_dict boxing sama dengan row dict di records() (mis. pd.NA nullable dtype -> None)
+            values = self.df[[key]].to_dict("list")[key]
+            self._lowered[key] = np.array([str(v).lower() for v in values], dtype=object)
+        return self._lowered[key]
+
+    def text_lower(self) -> np.ndarray:
+        """Combined title/description/tags (lowercase) untuk kondisi "words"."""
+        if self._text_lower is None and self.text_index is not None and "id" in self.df.columns:
+            ids = self.df["id"].tolist()
+            if all(entity_id in self.text_index for entity_id in ids):
+                self._text_lower = np.array(self.text_index.rule_texts(ids), dtype=object)
+        if self._text_lower is None:
+            parts = {col: (self.df[col].tolist() if col in self.df.columns else [None] * self.n)
+                     for col in ("title", "description", "tags")}
+            self._text_lower = np.array([
+                rule_text({"title": title, "description": description, "tags": tags}).lower()
+                for title, description, tags in zip(parts["title"], parts["description"], parts["tags"])
+            ], dtype=object)
+        return self._text_lower
+
+    def nonempty_text(self) -> np.ndarray:
+        """Mask combined text yang tidak kosong, dipakai bersama oleh semua kondisi "words"."""
+        if self._nonempty_text is None:
+            self._nonempty_text = self.text_lower().astype(bool)
+        return self._nonempty_text
+
+    def keyword_hits(self, matcher: KeywordMatcher) -> np.ndarray:
+        """Hit matrix (n_candidates, n_keywords): setiap text hanya di-scan sekali per matcher."""
+        key = id(matcher)
+        if key not in self._keyword_hits:
+            self._keyword_hits[key] = matcher.hits_matrix(self.text_lower())
+        return self._keyword_hits[key]
+
+    def records(self) -> List[Dict[str, Any]]:
+        if self._records is None:
+            self._records = self.df.to_dict("records")
+        return self._records
+
+
+def _never_column(columns: CandidateColumns) -> np.ndarray:
+    return np.zeros(columns.n, dtype=bool)
+
+
+def compile_condition_columnar(condition: Dict[str, Any], columns,
+                               matcher: KeywordMatcher = None) -> Optional[Callable[[CandidateColumns], np.ndarray]]:
+    """
+    Versi columnar dari compile_condition: check(CandidateColumns) -> bool array
+    untuk semua candidates sekaligus. `columns` = kolom candidates DataFrame.
+    `matcher` (opsional) = KeywordMatcher bersama yang memuat words condition ini.
+    None kalau condition tidak bisa di-vectorize (caller memakai check per row).
+    """
+    kind = condition.get("kind")
+    columns = list(columns)
+    
+    if kind == "numeric":
+        field = condition.get("field")
+        op_str = condition.get("operator")
+        
+        if not op_str or not field:
+            return _never_column
+        op_func = OPS.get(op_str)
+        if not op_func:
+            return _never_column
+        try:
+            target_num = float(condition.get("value", 0))
+        except (ValueError, TypeError):
+            return _never_column
+        key = field_resolver(tuple(columns)).resolve(field)
+        if key is not None and op_func not in _VECTOR_OPS:
+            # mis. "contains" pada angka: pakai check per row
+            return None
+        
+        def check_numeric(cols):
+            if key is None:
+                # Field tidak ada -> semua candidate bernilai 0.0 (float, sama dengan check per row)
+                return np.full(cols.n, bool(op_func(0.0, target_num)))
+            values, valid = cols.numeric(key)
+            return _apply_op(op_func, values, target_num) & valid
+        return check_numeric
+    
+    if kind == "words":
+        words = condition.get("words", [])
+        if not words:
+            return _never_column
+        match_all = condition.get("operator", "any") == "all"
+        try:
+            lowered = [w for w in (str(w).lower().strip() for w in words if w) if w]
+        except Exception:
+            return _never_column
+        if matcher is None or any(w not in matcher.index for w in lowered):
+            matcher = KeywordMatcher(lowered)
+        columns_idx = sorted({matcher.index[w] for w in lowered})
+        
+        def check_words(cols):
+            hits = cols.keyword_hits(matcher)[:, columns_idx]
+            if match_all:
+                return cols.nonempty_text() & hits.all(axis=1)
+            return cols.nonempty_text() & hits.any(axis=1)
+        return check_words
+    
+    if kind == "field":
+        field = condition.get("field")
+        op_func = OPS.get(condition.get("operator", "="))
+        
+        if not field or not op_func:
+            return _never_column
+        target_lower = str(condition.get("value")).lower()
+        key = field_resolver(tuple(columns)).resolve(field)
+        
+        def check_field(cols):
+            values = cols.lowered(key) if key is not None else np.full(cols.n, "0", dtype=object)
+            return _apply_op(op_func, values, target_lower)
+        return check_field
+    
+    return _never_column
+
+
+def _condition_words(conditions: List[Dict[str, Any]]) -> List[str]:
+    """Semua words (lowercase) dari words conditions, untuk KeywordMatcher bersama."""
+    words = []
+    for condition in conditions:
+        if condition.get("kind") != "words":
+            continue
+        try:
+            words.extend(w for w in (str(w).lower().strip() for w in condition.get("words", []) or [] if w) if w)
+        except Exception:
+            continue
+    return words
+
+
+class ConditionPlan:
+    """
+    Conditions satu challenge yang sudah di-compile sekali, lalu dijalankan
+    ke semua candidates: per candidate tinggal perbandingan.
+    """
+
+    def __init__(self, conditions: List[Dict[str, Any]], columns=None):
+        self.conditions = list(conditions)
+        self.columns = None
+        self._column_checks = None
+        if columns is not None:
+            self._compile(list(columns))
         else:
-            print(f"    Unknown condition kind: {kind}")
-            return False
-            
-    except Exception as e:
-        print(f"    Error evaluating condition: {e}")
-        return False
+            self.checks = [compile_condition(condition) for condition in self.conditions]
+
+    def _compile(self, columns: list):
+        """Compile check per row dan columnar untuk schema `columns` (sekali per schema)."""
+        self.columns = columns
+        self.checks = [compile_condition(condition, columns) for condition in self.conditions]
+        # Satu KeywordMatcher untuk semua words conditions: text di-scan sekali
+        matcher = KeywordMatcher(_condition_words(self.conditions))
+        self._column_checks = [
+            compile_condition_columnar(condition, columns, matcher) for condition in self.conditions
+        ]
+
+    def __len__(self):
+        return len(self.checks)
+
+    def evaluate(self, candidate: Dict[str, Any]) -> List[bool]:
+        """Hasil (passed/failed) setiap condition untuk satu candidate."""
+        return [check(candidate) for check in self.checks]
+
+    def evaluate_frame(self, candidates_df: pd.DataFrame, text_index=None) -> np.ndarray:
+        """
+        Evaluasi columnar: bool array shape (n_conditions, n_candidates).
+        Condition yang tidak bisa di-vectorize (compile_condition_columnar -> None)
+        di-evaluasi per row (hasil tetap sama dengan evaluate()).
+        text_index (opsional): TextIndex untuk combined text kondisi "words".
+        """
+        columns = list(candidates_df.columns)
+        if self._column_checks is None or self.columns != columns:
+            # Plan tanpa columns, atau schema candidates berbeda dari saat plan dibuat
+            self._compile(columns)
+        
+        cols = CandidateColumns(candidates_df, text_index)
+        passed = np.zeros((len(self.conditions), cols.n), dtype=bool)
+        for i, (check_column, check) in enumerate(zip(self._column_checks, self.checks)):
+            if check_column is not None:
+                try:
+                    passed[i] = check_column(cols)
+                    continue
+                except (TypeError, ValueError):
+                    # Data kolom yang tidak terduga: log lalu fallback ke check per row
+                    logger.warning("⚠️ Columnar check failed, evaluating per row", exc_info=True,
+                                   extra=fields(condition=self.conditions[i]))
+            passed[i] = [bool(check(candidate)) for candidate in cols.records()]
+        return passed
+
+
+def compile_conditions(conditions: List[Dict[str, Any]], columns=None) -> ConditionPlan:
+    return ConditionPlan(conditions or [], columns)
+
+
+def evaluate_condition(condition: Dict[str, Any], candidate: Dict[str, Any]) -> bool:
+    """Evaluate a single condition against a candidate"""
+    return compile_condition(condition)(candidate)
 
 
 def rule_based_match(challenge: Dict[str, Any], candidates_df: pd.DataFrame) -> List[Dict[str, Any]]:
@@ -170,23 +469,27 @@ def rule_based_match(challenge: Dict[str, Any], candidates_df: pd.DataFrame) ->
 
 def rule_based_match_improved(challenge: Dict[str, Any], candidates_df: pd.DataFrame, 
                              min_conditions_passed: int = 1,
-                             min_score_threshold: float = 0.1) -> List[Dict[str, Any]]:
+                             min_score_threshold: float = 0.1,
+                             sort_results: bool = True,
+                             text_index=None) -> List[Dict[str, Any]]:
     """
-    Improved rule-based matching dengan filtering yang lebih ketat
+    Improved rule-based matching dengan filtering yang lebih ketat.
+    sort_results=False melewati sort (rule_score, engagement) untuk caller yang
+    me-ranking ulang sendiri (mis. dengan final_score).
+    text_index (opsional): TextIndex dari load ini (combined text tidak dibuat ulang).
     """
     conditions = challenge.get("conditions", []) or []
     total_conditions = len(conditions)
     results = []
     
     challenge_id = challenge.get("id", "unknown")
-    print(f"\n🔍 Processing challenge: {challenge_id}")
-    print(f"📋 Total conditions: {total_conditions}")
+    logger.debug("🔍 Processing challenge %s (%d conditions)", challenge_id, total_conditions)
     
     if total_conditions == 0:
-        print("⚠️ No conditions found - returning all candidates with score 1.0")
+        logger.info("⚠️ No conditions found - returning all candidates with score 1.0",
+                    extra=fields(challenge_id=challenge_id, candidates=len(candidates_df)))
         # If no conditions, return all candidates with perfect score
-        for _, row in candidates_df.iterrows():
-            candidate = row.to_dict()
+        for candidate in candidates_df.to_dict("records"):
             results.append({
                 "id": candidate.get("id"),
                 "title": candidate.get("title", "")[:50],
@@ -198,69 +501,44 @@ def rule_based_match_improved(challenge: Dict[str, Any], candidates_df: pd.DataF
             })
         return results
 
-    for idx, row in candidates_df.iterrows():
-        candidate = row.to_dict()
-        candidate_id = candidate.get("id", f"idx_{idx}")
-        
-        print(f"\n  👤 Candidate: {candidate_id} | {candidate.get('title', '')[:40]}")
-        
-        passed_conditions = 0
-        condition_details = []
-        
-        for cond_idx, condition in enumerate(conditions):
-            print(f"    Condition {cond_idx + 1}/{total_conditions}:")
-            
-            try:
-                is_passed = evaluate_condition(condition, candidate)
-                if is_passed:
-                    passed_conditions += 1
-                    
-                condition_details.append({
-                    "condition": condition,
-                    "passed": is_passed
-                })
-                
-                print(f"    ✅ Passed: {is_passed}")
-                
-            except Exception as e:
-                print(f"    ❌ Error evaluating condition: {e}")
-                condition_details.append({
-                    "condition": condition,
-                    "passed": False
-                })
-
-        # Calculate score
-        score = (passed_conditions / total_conditions) if total_conditions > 0 else 1.0
-        
-        print(f"  📊 Score: {passed_conditions}/{total_conditions} = {score:.2f}")
-        
-        # Determine if should include
-        should_include = False
-        
-        if total_conditions == 0:
-            should_include = True
-            reason = "no conditions"
-        elif passed_conditions >= min_conditions_passed and score >= min_score_threshold:
-            should_include = True
-            reason = f"passed {passed_conditions} conditions (min: {min_conditions_passed}) and score {score:.2f} (min: {min_score_threshold})"
-        elif score >= 0.5:  # High score override
-            should_include = True
-            reason = f"high score override: {score:.2f}"
-        else:
-            reason = f"failed: only {passed_conditions} conditions passed, score {score:.2f}"
-            
-        print(f"  🎯 Include: {should_include} ({reason})")
-            
-        if should_include:
-            results.append({
-                "id": candidate_id,
-                "title": candidate.get("title", "")[:50],
-                "passed_conditions": passed_conditions,
-                "total_conditions": total_conditions,
-                "score": score,
-                "condition_details": condition_details,
-                "raw": candidate,
-            })
+    # Compile conditions sekali per challenge, lalu evaluasi per kolom untuk semua candidates
+    plan = compile_conditions(conditions, candidates_df.columns)
+    passed = plan.evaluate_frame(candidates_df, text_index)
+    passed_counts = passed.sum(axis=0)
+    scores = passed_counts / total_conditions
+    
+    # Include: cukup conditions lolos dan score >= threshold, atau high score override (>= 0.5)
+    include = ((passed_counts >= min_conditions_passed) & (scores >= min_score_threshold)) | (scores >= 0.5)
+    survivors = np.flatnonzero(include)
+    
+    # Row dict hanya dibuat untuk candidate yang lolos
+    records = candidates_df.iloc[survivors].to_dict("records")
+    for pos, candidate in zip(survivors, records):
+        results.append({
+            "id": candidate.get("id", f"idx_{candidates_df.index[pos]}"),
+            "title": candidate.get("title", "")[:50],
+            "passed_conditions": int(passed_counts[pos]),
+            "total_conditions": total_conditions,
+            "score": float(scores[pos]),
+            "condition_details": [
+                {"condition": condition, "passed": bool(is_passed)}
+                for condition, is_passed in zip(conditions, passed[:, pos])
+            ],
+            "raw": candidate,
+        })
+        if sampled(logger):
+            logger.debug("👤 Candidate %s | %s | %d/%d conditions passed",
+                         results[-1]["id"], results[-1]["title"], results[-1]["passed_conditions"], total_conditions)
+
+    # Per-challenge summary (satu record per challenge, bukan per candidate)
+    logger.info("✅ Rule matching done", extra=fields(
+        challenge_id=challenge_id,
+        conditions=total_conditions,
+        candidates=len(candidates_df),
+        matched=len(results),
+        min_conditions=min_conditions_passed,
+        min_score=min_score_threshold,
+    ))
 
     # Sort by score (descending) and engagement
     def sort_key(x):
@@ -285,43 +563,49 @@ def rule_based_match_improved(challenge: Dict[str, Any], candidates_df: pd.DataF
         
         return (rule_score, engagement)
 
-    results_sorted = sorted(results, key=sort_key, reverse=True)
-    
-    print(f"\n✅ Final results: {len(results_sorted)} candidates matched")
-    for i, result in enumerate(results_sorted[:5]):  # Show top 5
-        print(f"  {i+1}. {result['id']} | {result['title']} | Score: {result['score']:.2f}")
+    if logger.isEnabledFor(logging.DEBUG):
+        for i, result in enumerate(top_k(results, 5, key=sort_key)):  # Show top 5
+            logger.debug("  %d. %s | %s | Score: %.2f", i + 1, result["id"], result["title"], result["score"])
     
-    return results_sorted
+    if not sort_results:
+        return results
+    return sorted(results, key=sort_key, reverse=True)
 
 
 def filter_by_similarity(matches: List[Dict], challenge_text: str, engine, 
-                        min_similarity: float = 0.1) -> List[Dict]:
+                        min_similarity: float = 0.1, text_index=None) -> List[Dict]:
     """
     Filter matches by minimum similarity threshold
     """
     filtered = []
-    
-    print(f"\n🔍 Filtering {len(matches)} matches by similarity (min: {min_similarity})")
+    errors = 0
+    candidate_texts = []
     
     for match in matches:
-        candidate_text = " ".join([
+        entry = text_index.get(match["id"]) if text_index is not None else None
+        candidate_texts.append(entry.document if entry is not None else " ".join([
             str(match["raw"].get("title", "")),
             str(match["raw"].get("description", "")),
             " ".join(match["raw"].get("tags", []) if isinstance(match["raw"].get("tags"), list) else [])
-        ])
-        
-        try:
-            sim_score = engine.compute(challenge_text, candidate_text)
-            
-            if sim_score >= min_similarity:
-                match["similarity_score"] = sim_score
-                filtered.append(match)
-                print(f"  ✅ {match['id']}: similarity {sim_score:.3f}")
-            else:
-                print(f"  ❌ {match['id']}: similarity {sim_score:.3f} < {min_similarity}")
-                
-        except Exception as e:
-            print(f"  ❌ {match['id']}: Error computing similarity: {e}")
+        ]))
+    
+    try:
+        # Satu transform + satu sparse product untuk semua candidate
+        sim_scores = engine.compute_many(challenge_text, candidate_texts)
+    except Exception as e:
+        logger.debug("  ❌ Error computing similarity: %s", e)
+        sim_scores = []
+        errors = len(matches)
+    
+    for match, sim_score in zip(matches, sim_scores):
+        sim_score = float(sim_score)
+        if sim_score >= min_similarity:
+            match["similarity_score"] = sim_score
+            filtered.append(match)
+        if sampled(logger):
+            logger.debug("  %s: similarity %.3f (min: %s)", match["id"], sim_score, min_similarity)
     
-    print(f"✅ {len(filtered)} matches passed similarity filter")
+    logger.info("✅ Similarity filter done", extra=fields(
+        matches=len(matches), passed=len(filtered), errors=errors, min_similarity=min_similarity,
+    ))
     return filtered
\ No newline at end of file
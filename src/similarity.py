@@ -1,36 +1,305 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+from scipy import sparse
+import hashlib
+import re
+import numpy as np
 import pandas as pd
+from typing import Optional
+
+
+# Sama dengan token_pattern default CountVectorizer
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase + token_pattern, identik dengan analyzer default CountVectorizer."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def analyze_document(doc) -> list[str]:
+    """Analyzer vectorizer: text di-tokenize, token list (dari TextIndex) dipakai apa adanya."""
+    return doc if isinstance(doc, list) else tokenize(doc)
+
+
+def _smooth_idf(df: np.ndarray, n_docs: int) -> np.ndarray:
+    # Sama dengan TfidfVectorizer(smooth_idf=True)
+    return np.log((1 + n_docs) / (1 + df)) + 1.0
 
 
 class SimilarityEngine:
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(max_features=5000)
+    def __init__(self, max_features: int = 5000, drift_threshold: float = 0.1):
+        self.vectorizer = CountVectorizer(max_features=max_features, analyzer=analyze_document,
+                                          token_pattern=None)
         self.fitted = False
+        # IDF yang dipakai untuk semua row di matrix dan untuk transform()
+        self.idf: Optional[np.ndarray] = None
+        # Statistik corpus untuk incremental update
+        self.df: Optional[np.ndarray] = None
+        self.n_docs = 0
+        self.counts = None
+        # Document matrix hasil fit: satu row (L2-normalized) per entity id
+        self.matrix = None
+        self.ids: list = []
+        self.index: dict = {}
+        # id -> content hash, untuk deteksi entity baru/berubah
+        self.fingerprints: dict = {}
+        # Jumlah entity baru/berubah/dihapus sejak full fit terakhir (lihat update())
+        self.delta_since_fit = 0
+        # id -> query row (1 x n_terms) untuk dokumen di luar matrix, lihat with_queries()
+        self.queries: dict = {}
+        # Relative IDF drift maksimum sebelum semua row di-normalize ulang
+        self.drift_threshold = drift_threshold
+        # Content hash corpus yang di-fit (diisi oleh modelStore)
+        self.version: Optional[str] = None
 
-    def fit(self, texts: list[str]):
-        self.vectorizer.fit(texts)
+    def fit(self, texts: list[str], ids: Optional[list] = None,
+            fingerprints: Optional[list[str]] = None):
+        """
+        Fit vectorizer. Kalau ids diberikan, hasil transform disimpan sebagai
+        document matrix (row ke-i = ids[i]) supaya scoring cukup lookup + dot product.
+        texts boleh berupa token list yang sudah di-tokenize (TextIndex); fingerprints
+        wajib diberikan untuk token list.
+        """
+        counts = self.vectorizer.fit_transform(texts).tocsr()
+        self.n_docs = counts.shape[0]
+        self.df = np.bincount(counts.indices, minlength=counts.shape[1])
+        self.idf = _smooth_idf(self.df, self.n_docs)
+
+        if ids is not None:
+            if len(ids) != len(texts):
+                raise ValueError("ids and texts must have the same length")
+            if fingerprints is None:
+                fingerprints = [text_fingerprint(text) for text in texts]
+            self.counts = counts
+            self.matrix = self._weight(counts)
+            self.ids = list(ids)
+            self.index = {entity_id: row for row, entity_id in enumerate(self.ids)}
+            self.fingerprints = dict(zip(self.ids, fingerprints))
+        self.delta_since_fit = 0
         self.fitted = True
 
-    def compute(self, text1: str, text2: str) -> float:
+    def update(self, texts: list[str], ids: list,
+               fingerprints: Optional[list[str]] = None) -> dict:
+        """
+        Incremental update ke corpus `ids`: hanya entity baru / berubah (fingerprint beda) yang
+        di-tokenize. Document frequency di-update, row baru ditambahkan, row yang berubah diganti
+        dan row untuk id yang tidak ada lagi di `ids` dibuang. Vocabulary tetap (term baru baru
+        masuk setelah full refit); stats["oov_share"] = porsi token dokumen delta di luar
+        vocabulary, supaya caller bisa memutuskan refit. Semua row di-normalize ulang hanya
+        kalau IDF drift > drift_threshold.
+
+        Tidak mengubah array yang sudah ada secara in-place, jadi aman dipakai pada copy()
+        sementara engine lama masih melayani request lain.
+        """
+        self._check_fitted()
+        if self.matrix is None:
+            raise RuntimeError("Incremental update needs an engine fitted with ids.")
+        if fingerprints is None:
+            fingerprints = [text_fingerprint(text) for text in texts]
+
+        added, changed = [], []
+        for pos, (entity_id, fp) in enumerate(zip(ids, fingerprints)):
+            if entity_id not in self.index:
+                added.append(pos)
+            elif self.fingerprints.get(entity_id) != fp:
+                changed.append(pos)
+        current = set(ids)
+        removed_rows = [row for row, entity_id in enumerate(self.ids) if entity_id not in current]
+
+        stats = {"added": len(added), "changed": len(changed), "removed": len(removed_rows),
+                 "oov_share": 0.0, "drift": 0.0, "renormalized": False}
+        delta = changed + added
+        if not delta and not removed_rows:
+            return stats
+
+        delta_counts = self.vectorizer.transform([texts[pos] for pos in delta]).tocsr()
+        n_terms = delta_counts.shape[1]
+        changed_rows = [self.index[ids[pos]] for pos in changed]
+        if delta:
+            n_tokens = sum(len(analyze_document(texts[pos])) for pos in delta)
+            stats["oov_share"] = float(1.0 - delta_counts.sum() / n_tokens) if n_tokens else 0.0
+
+        # Document frequency: buang kontribusi versi lama (changed + removed), tambah versi baru
+        df = self.df + np.bincount(delta_counts.indices, minlength=n_terms)
+        if changed_rows or removed_rows:
+            df = df - np.bincount(self.counts[changed_rows + removed_rows].indices, minlength=n_terms)
+        n_docs = self.n_docs + len(added) - len(removed_rows)
+
+        # Row target untuk setiap dokumen delta (changed = row lama, added = row baru di akhir)
+        n_old = len(self.ids)
+        targets = np.array(changed_rows + list(range(n_old, n_old + len(added))), dtype=np.int64)
+        n_total = n_old + len(added)
+
+        # Row yang diganti di-nol-kan, lalu delta di-scatter ke posisi targetnya
+        keep = np.ones(n_total)
+        keep[changed_rows] = 0.0
+        scatter = sparse.csr_matrix(
+            (np.ones(len(delta)), (targets, np.arange(len(delta)))),
+            shape=(n_total, len(delta)),
+        )
+        # Row yang tersisa setelah entity yang dihapus dibuang
+        survivors = np.setdiff1d(np.arange(n_total), removed_rows) if removed_rows else None
+
+        def place(base, rows):
+            grown = sparse.vstack([base, sparse.csr_matrix((len(added), n_terms), dtype=base.dtype)], format="csr")
+            placed = sparse.diags(keep, dtype=base.dtype) @ grown + scatter.astype(base.dtype) @ rows
+            placed.eliminate_zeros()
+            placed = placed.tocsr()
+            return placed[survivors] if survivors is not None else placed
+
+        grown_ids = self.ids + [ids[pos] for pos in added]
+        self.counts = place(self.counts, delta_counts)
+        self.df = df
+        self.n_docs = n_docs
+        self.ids = [grown_ids[row] for row in survivors] if survivors is not None else grown_ids
+        self.index = {entity_id: row for row, entity_id in enumerate(self.ids)}
+        fingerprints_by_id = {**self.fingerprints, **{ids[pos]: fingerprints[pos] for pos in delta}}
+        self.fingerprints = {entity_id: fingerprints_by_id[entity_id] for entity_id in self.ids}
+        self.delta_since_fit += len(delta) + len(removed_rows)
+
+        idf = _smooth_idf(df, n_docs)
+        drift = float(np.max(np.abs(idf - self.idf) / self.idf)) if len(idf) else 0.0
+        stats["drift"] = drift
+        if drift > self.drift_threshold:
+            # Full re-normalization dari raw counts (tanpa tokenisasi ulang)
+            self.idf = idf
+            self.matrix = self._weight(self.counts)
+            stats["renormalized"] = True
+        else:
+            # IDF lama tetap dipakai supaya row lama dan baru konsisten
+            self.matrix = place(self.matrix, self._weight(delta_counts) if delta else delta_counts)
+        return stats
+
+    def copy(self) -> "SimilarityEngine":
+        """Shallow copy; update() pada copy tidak mengubah engine asal."""
+        clone = SimilarityEngine.__new__(SimilarityEngine)
+        clone.__dict__ = dict(self.__dict__)
+        return clone
+
+    def with_queries(self, texts: list[str], ids: list) -> "SimilarityEngine":
+        """
+        Copy dengan dokumen tambahan (mis. challenge baru) sebagai query rows, di-weight
+        dengan IDF saat ini. Hanya dokumen itu yang di-transform; document matrix, vocabulary
+        dan IDF dipakai bersama tanpa copy, jadi skor candidates sama seperti kalau dokumen
+        itu ikut di-fit tanpa mengubah statistik corpus.
+        """
+        self._check_fitted()
+        if self.matrix is None:
+            raise RuntimeError("Query rows need an engine fitted with ids.")
+        rows = self.transform(texts)
+        clone = self.copy()
+        clone.queries = {**self.queries, **{entity_id: rows[i] for i, entity_id in enumerate(ids)}}
+        return clone
+
+    def query_vector(self, query_id):
+        """Row TF-IDF (1 x n_terms) untuk query_id: query row atau row document matrix, None kalau tidak ada."""
+        if query_id in self.queries:
+            return self.queries[query_id]
+        row = self.index.get(query_id)
+        if self.matrix is None or row is None:
+            return None
+        return self.matrix[row]
+
+    def _check_fitted(self):
         if not self.fitted:
             raise RuntimeError("Vectorizer not fitted. Call fit() first.")
-        X = self.vectorizer.transform([text1, text2])
+
+    def _weight(self, counts):
+        """Raw counts -> TF-IDF rows (L2-normalized) dengan IDF saat ini."""
+        return normalize(counts @ sparse.diags(self.idf), norm="l2").tocsr()
+
+    def transform(self, texts: list[str]):
+        self._check_fitted()
+        return self._weight(self.vectorizer.transform(texts))
+
+    def compute(self, text1: str, text2: str) -> float:
+        X = self.transform([text1, text2])
         sim = cosine_similarity(X[0], X[1])[0][0]
         return float(sim)
 
+    def compute_many(self, text: str, texts: list[str]) -> np.ndarray:
+        """
+        Similarity satu text (challenge) terhadap banyak text (candidates).
+        Setiap text hanya di-transform sekali, skor dihitung dengan satu sparse product.
+        """
+        self._check_fitted()
+        if len(texts) == 0:
+            return np.zeros(0)
+        X = self.transform([text, *texts])
+        return cosine_similarity(X[0], X[1:])[0]
+
+    def rows(self, ids: list) -> np.ndarray:
+        """Row index untuk setiap id, -1 kalau id tidak ada di document matrix."""
+        return np.array([self.index.get(entity_id, -1) for entity_id in ids], dtype=np.int64)
+
+    def compute_ids(self, query_id, candidate_ids: list) -> np.ndarray:
+        """
+        Similarity dokumen query_id terhadap candidate_ids memakai document matrix
+        yang sudah di-fit (tanpa tokenisasi ulang). Id yang tidak dikenal dapat skor 0.
+        """
+        self._check_fitted()
+        scores = np.zeros(len(candidate_ids))
+        query = self.query_vector(query_id)
+        if query is None or len(candidate_ids) == 0:
+            return scores
+        rows = self.rows(candidate_ids)
+        known = rows >= 0
+        if known.any():
+            # rows sudah L2-normalized, jadi dot product = cosine similarity
+            product = self.matrix[rows[known]] @ query.T
+            scores[known] = product.toarray().ravel()
+        return scores
+
+
+def document_text(record) -> str:
+    """Gabungan title + description + tags yang dipakai untuk TF-IDF."""
+    tags = record.get("tags", [])
+    return " ".join([
+        str(record.get("title", "")),
+        str(record.get("description", "")),
+        " ".join(str(t) for t in tags) if isinstance(tags, list) else ""
+    ])
+
+
+def text_fingerprint(text: str, created_at=None) -> str:
+    """Content hash per entity (created_at + text) untuk deteksi perubahan."""
+    h = hashlib.sha1(str(created_at or "").encode("utf-8"))
+    h.update(b"\0")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+def corpus_documents(candidates: pd.DataFrame, challenges: pd.DataFrame,
+                     text_index=None) -> tuple[list, list, list[str]]:
+    """
+    Return (ids, texts, fingerprints) untuk semua candidates + challenges, urutan sesuai row.
+    Dengan text_index, texts = token list yang sudah ada di index (tanpa join/tokenize ulang).
+    """
+    if text_index is not None:
+        ids = []
+        for df in [candidates, challenges]:
+            ids.extend(df["id"].tolist() if "id" in df.columns else [None] * len(df))
+        if all(entity_id in text_index for entity_id in ids):
+            entries = [text_index.get(entity_id) for entity_id in ids]
+            return ids, [entry.tokens for entry in entries], [entry.fingerprint for entry in entries]
 
-def build_similarity_engine(candidates: pd.DataFrame, challenges: pd.DataFrame) -> SimilarityEngine:
     texts = []
+    ids = []
+    fingerprints = []
     for df in [candidates, challenges]:
-        for _, row in df.iterrows():
-            s = " ".join([
-                str(row.get("title", "")),
-                str(row.get("description", "")),
-                " ".join(row.get("tags", []) if isinstance(row.get("tags"), list) else [])
-            ])
-            texts.append(s)
-    engine = SimilarityEngine()
-    engine.fit(texts)
-    return engine 
+        for record in df.to_dict("records"):
+            text = document_text(record)
+            texts.append(text)
+            ids.append(record.get("id"))
+            fingerprints.append(text_fingerprint(text, record.get("created_at")))
+    return ids, texts, fingerprints
 
+
+def build_similarity_engine(candidates: pd.DataFrame, challenges: pd.DataFrame,
+                            text_index=None) -> SimilarityEngine:
+    ids, texts, fingerprints = corpus_documents(candidates, challenges, text_index)
+    engine = SimilarityEngine()
+    engine.fit(texts, ids=ids, fingerprints=fingerprints)
+    return engine
@@ -0,0 +1,253 @@
+"""
+In-memory snapshot untuk matching: frames yang sudah di-preprocess (ideas,
+campaigns, challenges + conditions), text index dan similarity engine.
+
+Ingestion (fetch, upsert, load conditions, preprocess, fit) jalan di luar request:
+saat snapshot pertama dibutuhkan, oleh background refresher tiap
+SNAPSHOT_REFRESH_INTERVAL detik, atau lewat refresh() (endpoint /ingest).
+Snapshot baru dibangun lengkap dulu lalu di-swap dengan satu assignment, jadi
+request yang sedang jalan tetap memakai snapshot lama sampai selesai.
+Snapshot diperlakukan read-only oleh pemakainya.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from src.getData import ingest_snapshot, load_challenge
+from src.logger import fields, get_logger
+from src.matching import CandidateViews
+from src.modelStore import get_similarity_engine
+from src.preprocessing import preprocess_dataframe
+from src.similarity import document_text
+from src.textIndex import build_text_index
+
+logger = get_logger("snapshotStore")
+
+# Detik antar refresh di background (0 = hanya refresh manual / saat pertama dipakai)
+SNAPSHOT_REFRESH_INTERVAL = float(os.environ.get("SNAPSHOT_REFRESH_INTERVAL", "300"))
+# Minimal detik antar background refresh yang dipicu challenge yang tidak ditemukan (per sources)
+SNAPSHOT_MISS_REFRESH_INTERVAL = float(os.environ.get("SNAPSHOT_MISS_REFRESH_INTERVAL", "60"))
+# Jumlah kombinasi source URLs yang snapshot-nya disimpan (LRU)
+SNAPSHOT_MAX_SOURCES = int(os.environ.get("SNAPSHOT_MAX_SOURCES", "4"))
+
+SourceKey = Tuple[str, str, str]
+
+
+class MatchingSnapshot:
+    __slots__ = ("sources", "ideas", "campaigns", "views", "challenges", "text_index", "engine", "built_at",
+                 "build_seconds", "index_cache", "candidate_memory", "upstream_hash")
+
+    def __init__(self, sources: SourceKey, ideas: pd.DataFrame, campaigns: pd.DataFrame, challenges: pd.DataFrame,
+                 text_index, engine, built_at: float, build_seconds: float, upstream_hash: Optional[str] = None):
+        self.sources = sources
+        # Hash payload upstream yang di-ingest (None untuk paginated ingestion)
+        self.upstream_hash = upstream_hash
+        self.ideas = ideas
+        self.campaigns = campaigns
+        # Candidate frame per challenge type, dibuat sekali per snapshot
+        self.views = CandidateViews(ideas, campaigns)
+        # Diagnostics, dihitung lazily di describe()
+        self.candidate_memory = None
+        self.challenges = challenges
+        self.text_index = text_index
+        self.engine = engine
+        self.built_at = built_at
+        self.build_seconds = build_seconds
+        # RetrievalIndex per candidate set (lihat shortlist_candidates), dipakai ulang antar request
+        self.index_cache = {}
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+    def challenge(self, challenge_id: str) -> Tuple[pd.DataFrame, object]:
+        """
+        Fast path untuk satu challenge: (frame 1 row, engine). Challenge yang belum ada di
+        snapshot dibaca langsung dari DB dan dokumennya ditambahkan sebagai query row ke copy
+        engine. Tidak ada fetch upstream / upsert; frame kosong kalau challenge juga tidak ada
+        di DB (caller bisa SnapshotStore.schedule_refresh supaya ter-ingest untuk request berikutnya).
+        """
+        challenge_df = self.challenges[self.challenges["id"] == challenge_id]
+        if not challenge_df.empty:
+            return challenge_df, self.engine
+        challenge_df = load_challenge(challenge_id)
+        if challenge_df.empty:
+            return challenge_df, self.engine
+        challenge_df = preprocess_dataframe(challenge_df)
+        engine = self.engine.with_queries(
+            [document_text(record) for record in challenge_df.to_dict("records")], challenge_df["id"].tolist()
+        )
+        logger.info("⚡ Challenge loaded outside snapshot", extra=fields(challenge_id=challenge_id))
+        return challenge_df, engine
+
+    def describe(self) -> dict:
+        if self.candidate_memory is None:
+            # Hanya diagnostics: tidak boleh menggagalkan snapshot build / response
+            try:
+                self.candidate_memory = self.views.memory_report(self.challenges)
+            except Exception as e:
+                logger.warning("⚠️ Candidate memory report failed: %s", e)
+                self.candidate_memory = {}
+        return {
+            "ideas": len(self.ideas),
+            "campaigns": len(self.campaigns),
+            "challenges": len(self.challenges),
+            "modelVersion": self.engine.version,
+            "builtAt": pd.Timestamp(self.built_at, unit="s", tz="UTC").isoformat(),
+            "buildTime": f"{int(self.build_seconds * 1000)}ms",
+            "candidateMemory": self.candidate_memory,
+        }
+
+
+def build_snapshot(ideas_url: str, campaigns_url: str, challenges_url: str,
+                   force_rebuild: bool = False, previous: Optional[MatchingSnapshot] = None) -> MatchingSnapshot:
+    """
+    Full ingestion: fetch + save, preprocess, text index, similarity engine.
+    previous: snapshot saat ini untuk sources yang sama; kalau payload upstream tidak berubah
+    (hash sama), snapshot itu dipakai lagi tanpa save / preprocess / fit. force_rebuild selalu membangun ulang.
+    """
+    start = time.time()
+    known_hash = previous.upstream_hash if previous is not None and not force_rebuild else None
+    frames, upstream_hash = ingest_snapshot(ideas_url, campaigns_url, challenges_url, known_hash=known_hash)
+    if frames is None:
+        return previous
+    ideas, campaigns, challenges = frames
+    ideas = preprocess_dataframe(ideas)
+    campaigns = preprocess_dataframe(campaigns)
+    challenges = preprocess_dataframe(challenges)
+    text_index = build_text_index(ideas, campaigns, challenges)
+
+    # Similarity model over the full corpus (persisted, only refit when the corpus changes)
+    engine = get_similarity_engine(pd.concat([ideas, campaigns]), challenges,
+                                   force_rebuild=force_rebuild, text_index=text_index)
+    return MatchingSnapshot(
+        sources=(ideas_url, campaigns_url, challenges_url),
+        ideas=ideas,
+        campaigns=campaigns,
+        challenges=challenges,
+        text_index=text_index,
+        engine=engine,
+        built_at=time.time(),
+        build_seconds=time.time() - start,
+        upstream_hash=upstream_hash,
+    )
+
+
+class SnapshotStore:
+    """Snapshot terbaru per kombinasi source URLs, dengan background refresher."""
+
+    def __init__(self, refresh_interval: float = SNAPSHOT_REFRESH_INTERVAL, max_sources: int = SNAPSHOT_MAX_SOURCES,
+                 miss_refresh_interval: float = SNAPSHOT_MISS_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.max_sources = max(1, max_sources)
+        self.miss_refresh_interval = miss_refresh_interval
+        # sources -> waktu background refresh terakhir yang dipicu schedule_refresh()
+        self._scheduled_at: Dict[SourceKey, float] = {}
+        self._snapshots: "OrderedDict[SourceKey, MatchingSnapshot]" = OrderedDict()
+        # Satu build dalam satu waktu; reader tidak pernah menunggu lock ini
+        self._build_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def current(self, ideas_url: str, campaigns_url: str, challenges_url: str) -> Optional[MatchingSnapshot]:
+        return self._snapshots.get((ideas_url, campaigns_url, challenges_url))
+
+    def get(self, ideas_url: str, campaigns_url: str, challenges_url: str) -> MatchingSnapshot:
+        """Snapshot saat ini; dibangun di request ini hanya kalau belum ada sama sekali."""
+        self._ensure_refresher()
+        snapshot = self.current(ideas_url, campaigns_url, challenges_url)
+        if snapshot is not None:
+            return snapshot
+        with self._build_lock:
+            # Request lain mungkin sudah membangunnya selagi menunggu lock
+            snapshot = self.current(ideas_url, campaigns_url, challenges_url)
+            if snapshot is not None:
+                return snapshot
+            return self._build_and_swap((ideas_url, campaigns_url, challenges_url), force_rebuild=False)
+
+    def refresh(self, ideas_url: str, campaigns_url: str, challenges_url: str,
+                force_rebuild: bool = False) -> MatchingSnapshot:
+        """Bangun snapshot baru dan swap. Kalau gagal, snapshot lama tetap dipakai (exception diteruskan)."""
+        self._ensure_refresher()
+        with self._build_lock:
+            return self._build_and_swap((ideas_url, campaigns_url, challenges_url), force_rebuild)
+
+    def schedule_refresh(self, ideas_url: str, campaigns_url: str, challenges_url: str) -> bool:
+        """
+        Refresh di background thread (mis. challenge yang belum ada di snapshot), tanpa membuat
+        caller menunggu. Per sources paling sering sekali per miss_refresh_interval, dan tidak
+        kalau build sedang jalan. Return True kalau refresh dijadwalkan.
+        """
+        sources = (ideas_url, campaigns_url, challenges_url)
+        now = time.time()
+        with self._swap_lock:
+            if sources not in self._snapshots or self._build_lock.locked():
+                return False
+            last = self._scheduled_at.get(sources)
+            if last is not None and now - last < self.miss_refresh_interval:
+                return False
+            # Hanya sources yang masih punya snapshot (dict tidak tumbuh dengan URL acak)
+            self._scheduled_at = {key: at for key, at in self._scheduled_at.items() if key in self._snapshots}
+            self._scheduled_at[sources] = now
+        threading.Thread(target=self._refresh_in_background, args=(sources,),
+                         name="snapshot-scheduled-refresh", daemon=True).start()
+        return True
+
+    def _refresh_in_background(self, sources: SourceKey):
+        try:
+            self.refresh(*sources)
+        except Exception as e:
+            logger.error("❌ Scheduled snapshot refresh failed, keeping previous snapshot: %s", e)
+
+    def _build_and_swap(self, sources: SourceKey, force_rebuild: bool) -> MatchingSnapshot:
+        previous = self.current(*sources)
+        snapshot = build_snapshot(*sources, force_rebuild=force_rebuild, previous=previous)
+        if snapshot is previous:
+            return snapshot
+        with self._swap_lock:
+            self._snapshots[sources] = snapshot
+            self._snapshots.move_to_end(sources)
+            while len(self._snapshots) > self.max_sources:
+                self._snapshots.popitem(last=False)
+        logger.info("🔄 Snapshot swapped", extra=fields(**snapshot.describe()))
+        return snapshot
+
+    def _ensure_refresher(self):
+        # Dimulai lazily supaya thread jalan di process yang melayani request (bukan master pre-fork)
+        if self.refresh_interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._swap_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._refresh_loop, name="snapshot-refresher", daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                # Keys diambil di bawah lock: swap/LRU eviction bisa mengubah dict bersamaan
+                with self._swap_lock:
+                    all_sources = list(self._snapshots)
+            except Exception as e:
+                logger.error("❌ Snapshot refresh failed: %s", e)
+                continue
+            for sources in all_sources:
+                if self.current(*sources) is None:
+                    # Sudah di-evict sejak keys diambil: jangan dibangun ulang
+                    continue
+                try:
+                    self.refresh(*sources)
+                except Exception as e:
+                    logger.error("❌ Snapshot refresh failed, keeping previous snapshot: %s", e)
+
+    def stop(self):
+        self._stop.set()
+
+
+snapshot_store = SnapshotStore()
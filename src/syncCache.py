@@ -0,0 +1,123 @@
+"""
+Local content-hash cache untuk sync ke Supabase.
+
+Menyimpan hash dari record terakhir yang berhasil di-upsert (per kind + id) di
+SQLite, supaya record yang tidak berubah sejak sync terakhir tidak dikirim lagi.
+Dipakai untuk users, ideas, campaigns, challenges dan challenge_conditions.
+SYNC_CACHE_PATH="" mematikan cache (semua record dianggap berubah).
+Kalau tabel di Supabase di-reset, hapus juga file cache ini.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from src.logger import get_logger
+
+logger = get_logger("syncCache")
+
+SYNC_CACHE_PATH = os.environ.get("SYNC_CACHE_PATH", os.path.join(tempfile.gettempdir(), "matching_sync.sqlite"))
+
+
+def record_hash(record: Dict[str, Any]) -> str:
+    """Hash stabil (sha1) dari isi record."""
+    payload = json.dumps(record, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+# key: nama field id, atau function record -> id (untuk record tanpa kolom id)
+RecordKey = Union[str, Callable[[Dict[str, Any]], Any]]
+
+
+def _record_id(record: Dict[str, Any], key: RecordKey) -> str:
+    return str(key(record) if callable(key) else record.get(key))
+
+
+class SyncCache:
+    def __init__(self, path: Optional[str] = SYNC_CACHE_PATH):
+        self.path = path or None
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                " kind TEXT NOT NULL, id TEXT NOT NULL, hash TEXT NOT NULL,"
+                " PRIMARY KEY (kind, id))"
+            )
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def _hashes(self, kind: str, ids: List[str]) -> Dict[str, str]:
+        known = {}
+        with self._lock:
+            conn = self._connect()
+            try:
+                # Batasi jumlah parameter per query (SQLite limit)
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = conn.execute(
+                        f"SELECT id, hash FROM fingerprints WHERE kind = ? AND id IN ({placeholders})",
+                        [kind, *chunk],
+                    )
+                    known.update(rows)
+            finally:
+                conn.close()
+        return known
+
+    def changed(self, kind: str, records: Iterable[Dict[str, Any]], key: RecordKey = "id") -> List[Dict[str, Any]]:
+        """Record yang baru atau isinya beda dari sync terakhir (urutan dipertahankan)."""
+        records = list(records)
+        if not self.enabled or not records:
+            return records
+        ids = [_record_id(record, key) for record in records]
+        try:
+            known = self._hashes(kind, ids)
+        except sqlite3.Error as e:
+            logger.warning("⚠️ Sync cache unavailable (%s), sending all %s", e, kind)
+            return records
+        return [record for record, record_id in zip(records, ids) if known.get(record_id) != record_hash(record)]
+
+    def mark(self, kind: str, records: Iterable[Dict[str, Any]], key: RecordKey = "id"):
+        """Simpan hash record yang sudah berhasil di-upsert."""
+        if not self.enabled:
+            return
+        rows = [(kind, _record_id(record, key), record_hash(record)) for record in records]
+        if not rows:
+            return
+        try:
+            with self._lock:
+                conn = self._connect()
+                try:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO fingerprints (kind, id, hash) VALUES (?, ?, ?)", rows
+                    )
+                    conn.commit()
+                finally:
+                    conn.close()
+        except sqlite3.Error as e:
+            # Cache hanya optimisasi; gagal tulis berarti record dikirim lagi next sync
+            logger.warning("⚠️ Could not update sync cache for %s: %s", kind, e)
+
+
+def snapshot_hash(payloads: Iterable[Any]) -> str:
+    """Hash dari seluruh raw payload upstream (satu snapshot ingestion)."""
+    digest = hashlib.sha1()
+    for payload in payloads:
+        digest.update(json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+sync_cache = SyncCache()
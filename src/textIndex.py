@@ -0,0 +1,123 @@
+"""
+Text index per entity, dibuat sekali per load (setelah preprocess_dataframe).
+
+Untuk setiap entity (key = id) disimpan:
+- document   : title + description + tags untuk TF-IDF (lihat similarity.document_text)
+- rule_text  : combined text lowercase untuk kondisi "words"
+- term_ids   : token (sudah di-tokenize sekali) sebagai id ke TextIndex.vocabulary
+- fingerprint: content hash untuk versioning model similarity
+
+Rule matching, similarity dan keyword check membaca dari sini, jadi setiap
+dokumen hanya di-join dan di-tokenize satu kali per load.
+"""
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from src.similarity import document_text, text_fingerprint, tokenize
+
+
+def rule_text(record: Dict[str, Any]) -> str:
+    """Combine title, description, and tags (teks untuk kondisi "words")."""
+    parts = []
+
+    title = record.get("title", "")
+    if title:
+        parts.append(str(title))
+
+    description = record.get("description", "")
+    if description:
+        parts.append(str(description))
+
+    tags = record.get("tags", [])
+    if isinstance(tags, list):
+        parts.extend([str(tag) for tag in tags])
+    elif isinstance(tags, str):
+        parts.append(tags)
+
+    return " ".join(parts)
+
+
+class TextEntry:
+    __slots__ = ("document", "rule_text", "term_ids", "fingerprint", "_index")
+
+    def __init__(self, document: str, rule_text: str, term_ids: np.ndarray, fingerprint: str, index: "TextIndex"):
+        self.document = document
+        self.rule_text = rule_text
+        self.term_ids = term_ids
+        self.fingerprint = fingerprint
+        self._index = index
+
+    @property
+    def tokens(self) -> List[str]:
+        """Token list (urutan asli, dengan duplikat) dari term_ids."""
+        return self._index.terms(self.term_ids)
+
+    @property
+    def token_set(self) -> frozenset:
+        return frozenset(self.tokens)
+
+
+class TextIndex:
+    """Entity id -> TextEntry, dengan satu vocabulary bersama untuk term_ids."""
+
+    def __init__(self):
+        self.entries: Dict[Any, TextEntry] = {}
+        self.vocabulary: Dict[str, int] = {}
+        self._terms: List[str] = []
+        self._terms_array = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, entity_id):
+        return entity_id in self.entries
+
+    def get(self, entity_id) -> Optional[TextEntry]:
+        return self.entries.get(entity_id)
+
+    def add(self, record: Dict[str, Any]) -> TextEntry:
+        document = document_text(record)
+        term_ids = np.fromiter(
+            (self._term_id(token) for token in tokenize(document)), dtype=np.int32
+        )
+        entry = TextEntry(
+            document=document,
+            rule_text=rule_text(record).lower(),
+            term_ids=term_ids,
+            fingerprint=text_fingerprint(document, record.get("created_at")),
+            index=self,
+        )
+        self.entries[record.get("id")] = entry
+        return entry
+
+    def add_frame(self, df: pd.DataFrame):
+        for record in df.to_dict("records"):
+            self.add(record)
+
+    def _term_id(self, token: str) -> int:
+        term_id = self.vocabulary.get(token)
+        if term_id is None:
+            term_id = self.vocabulary[token] = len(self._terms)
+            self._terms.append(token)
+            self._terms_array = None
+        return term_id
+
+    def terms(self, term_ids: np.ndarray) -> List[str]:
+        if self._terms_array is None:
+            self._terms_array = np.array(self._terms, dtype=object)
+        return self._terms_array[term_ids].tolist() if len(term_ids) else []
+
+    def documents(self, ids: list) -> List[str]:
+        return [self.entries[entity_id].document for entity_id in ids]
+
+    def rule_texts(self, ids: list) -> List[str]:
+        return [self.entries[entity_id].rule_text for entity_id in ids]
+
+
+def build_text_index(*frames: pd.DataFrame) -> TextIndex:
+    """Text index untuk semua entity di frames (ideas, campaigns, challenges)."""
+    index = TextIndex()
+    for df in frames:
+        index.add_frame(df)
+    return index
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import modules sebagai src.<module>, sama seperti api.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,109 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src import getData
+from src.getData import condition_id, condition_key
+
+CHALLENGE = "2f0c4a52-3b1e-4d8f-9a6c-1e2d3c4b5a69"
+USER = "7a1b2c3d-4e5f-4a6b-8c7d-9e0f1a2b3c4d"
+
+
+@pytest.mark.parametrize("a, b", [
+    # Urutan key dict condition
+    ({"kind": "metric", "field": "votes", "operator": ">=", "value": 10},
+     {"value": 10, "operator": ">=", "field": "votes", "kind": "metric"}),
+    # Urutan key di dalam value dict
+    ({"kind": "metric", "field": "meta", "operator": "=", "value": {"a": 1, "b": [1, 2]}},
+     {"kind": "metric", "field": "meta", "operator": "=", "value": {"b": [1, 2], "a": 1}}),
+    # Words dicocokkan sebagai set: urutan, duplikat, case dan spasi tidak berpengaruh
+    ({"kind": "words", "operator": "all", "words": ["solar", "Bike"]},
+     {"words": ["bike ", "solar", "solar"], "operator": "all", "kind": "words"}),
+    # words null dari DB = words tidak ada
+    ({"kind": "metric", "field": "votes", "operator": ">", "value": 1, "words": None},
+     {"kind": "metric", "field": "votes", "operator": ">", "value": 1, "words": []}),
+])
+def test_equivalent_conditions_share_id(a, b):
+    assert condition_key(a) == condition_key(b)
+    assert condition_id(CHALLENGE, a) == condition_id(CHALLENGE, b)
+
+
+@pytest.mark.parametrize("a, b", [
+    ({"kind": "metric", "field": "votes", "operator": ">=", "value": 10},
+     {"kind": "metric", "field": "votes", "operator": ">", "value": 10}),
+    ({"kind": "metric", "field": "votes", "operator": ">=", "value": 10},
+     {"kind": "metric", "field": "supports", "operator": ">=", "value": 10}),
+    ({"kind": "words", "operator": "all", "words": ["solar", "bike"]},
+     {"kind": "words", "operator": "any", "words": ["solar", "bike"]}),
+    ({"kind": "words", "operator": "all", "words": ["solar", "bike"]},
+     {"kind": "words", "operator": "all", "words": ["solar"]}),
+])
+def test_different_conditions_get_different_ids(a, b):
+    assert condition_id(CHALLENGE, a) != condition_id(CHALLENGE, b)
+
+
+def test_condition_id_depends_on_challenge():
+    condition = {"kind": "metric", "field": "votes", "operator": ">=", "value": 10}
+    assert condition_id(CHALLENGE, condition) != condition_id(USER, condition)
+    assert condition_id(CHALLENGE, condition) == condition_id(CHALLENGE, dict(condition))
+
+
+def test_equivalent_conditions_are_saved_once(monkeypatch):
+    upserts = {}
+
+    def upsert_changed(table, records, key="id"):
+        upserts[table] = records
+        return len(records)
+
+    monkeypatch.setattr(getData, "upsert_changed", upsert_changed)
+    conditions = [
+        {"kind": "metric", "field": "votes", "operator": ">=", "value": 10},
+        {"value": 10, "operator": ">=", "field": "votes", "kind": "metric"},
+        {"kind": "words", "operator": "any", "words": ["solar", "bike"]},
+        {"kind": "words", "operator": "any", "words": ["Bike", "solar"]},
+    ]
+    challenge = {"id": CHALLENGE, "title": "Green city", "user": {"id": USER}, "conditions": conditions}
+
+    # Challenge yang sama dua kali di payload -> tetap dua condition row
+    getData.save_challenges_normalized_without_conditions_column([challenge, dict(challenge)])
+
+    rows = upserts["challenge_conditions"]
+    assert len(rows) == 2
+    assert len({row["id"] for row in rows}) == 2
+    assert {row["id"] for row in rows} == {condition_id(CHALLENGE, conditions[0]), condition_id(CHALLENGE, conditions[2])}
+    assert all(row["challenge_id"] == CHALLENGE for row in rows)
+
+
+class _ConditionsTable:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def select(self, *args):
+        return self
+
+    def in_(self, column, values):
+        self.rows = [row for row in self.rows if row[column] in values]
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=self.rows)
+
+
+def test_duplicate_rows_are_loaded_once(monkeypatch):
+    # Row lama (sebelum deterministic id) bisa duplikat dengan urutan words berbeda
+    rows = [
+        {"challenge_id": "h1", "kind": "metric", "field": "votes", "operator": ">=", "value": 10, "words": None},
+        {"challenge_id": "h1", "kind": "words", "field": None, "operator": "any", "value": None, "words": ["a", "b"]},
+        {"challenge_id": "h1", "kind": "metric", "field": "votes", "operator": ">=", "value": 10, "words": None},
+        {"challenge_id": "h1", "kind": "words", "field": None, "operator": "any", "value": None, "words": ["b", "a"]},
+        {"challenge_id": "h2", "kind": "metric", "field": "votes", "operator": ">=", "value": 10, "words": None},
+        {"challenge_id": "h3", "kind": "metric", "field": "votes", "operator": ">=", "value": 10, "words": None},
+    ]
+    monkeypatch.setattr(getData, "supabase", SimpleNamespace(table=lambda name: _ConditionsTable(rows)))
+
+    loaded = getData.load_conditions_from_separate_table(["h1", "h2"])
+
+    assert sorted(loaded) == ["h1", "h2"]
+    assert [c["kind"] for c in loaded["h1"]] == ["metric", "words"]
+    assert loaded["h1"][1]["words"] == ["a", "b"]
+    assert len(loaded["h2"]) == 1
@@ -0,0 +1,75 @@
+"""
+Concurrent upstream fetch (getData.ingest_snapshot) terhadap HTTP stub server lokal.
+Tidak ada DB write: known_hash = hash payload stub, jadi ingestion berhenti setelah fetch.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src import getData
+from src.syncCache import snapshot_hash
+
+DELAY = 0.4
+PAYLOADS = {
+    "/ideas": [{"id": "i1", "title": "Solar bike"}],
+    "/campaigns": [{"id": "c1", "title": "Clean river"}],
+    "/challenges": [{"id": "h1", "title": "Green city"}],
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    flaky_failures = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: bytes = b""):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/flaky" and StubHandler.flaky_failures > 0:
+            StubHandler.flaky_failures -= 1
+            self._send(503)
+            return
+        time.sleep(DELAY)
+        self._send(200, json.dumps({"data": PAYLOADS.get(path, [{"id": "f1"}])}).encode("utf-8"))
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_sources_are_fetched_concurrently(stub_url, monkeypatch):
+    monkeypatch.setattr(getData, "FETCH_PAGE_SIZE", 0)
+    urls = [stub_url + path for path in ("/ideas", "/campaigns", "/challenges")]
+    expected = snapshot_hash([urls, *PAYLOADS.values()])
+
+    start = time.time()
+    frames, upstream_hash = getData.ingest_snapshot(*urls, known_hash=expected)
+    elapsed = time.time() - start
+
+    assert frames is None
+    assert upstream_hash == expected
+    # Serial fetch butuh >= 3 * DELAY; paralel ~ satu DELAY
+    assert DELAY <= elapsed < 2 * DELAY
+
+
+def test_fetch_retries_transient_errors(stub_url):
+    StubHandler.flaky_failures = 2
+    assert getData.fetch_api(stub_url + "/flaky") == [{"id": "f1"}]
+    assert StubHandler.flaky_failures == 0
@@ -0,0 +1,52 @@
+"""
+Fuzz: KeywordMatcher (Aho-Corasick dan fallback substring scan) vs `w in text` per keyword.
+Alphabet kecil dengan karakter regex dan spasi supaya keyword sering overlap / berulang.
+"""
+import random
+
+import numpy as np
+import pytest
+
+from src import keywords
+from src.keywords import KeywordMatcher
+
+ALPHABET = "ab.c*( "
+
+
+def random_text(rnd: random.Random, max_len: int) -> str:
+    return "".join(rnd.choice(ALPHABET + "\n") for _ in range(rnd.randint(0, max_len)))
+
+
+@pytest.fixture(params=["automaton", "fallback"])
+def backend(request, monkeypatch):
+    if request.param == "automaton":
+        if keywords.ahocorasick is None:
+            pytest.skip("pyahocorasick not installed")
+    else:
+        monkeypatch.setattr(keywords, "ahocorasick", None)
+    return request.param
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_matcher_matches_substring_scan(backend, seed):
+    rnd = random.Random(seed)
+    for _ in range(3000):
+        words = ["".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(0, 4))) for _ in range(rnd.randint(0, 6))]
+        text = random_text(rnd, 30)
+        matcher = KeywordMatcher(words)
+
+        assert matcher.find(text) == {i for i, word in enumerate(matcher.words) if word in text}, (words, text)
+        present = [word in text for word in words if word]
+        assert matcher.contains(text, match_all=True) == all(present), (words, text)
+        assert matcher.contains(text, match_all=False) == any(present), (words, text)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_hits_matrix_matches_substring_scan(backend, seed):
+    rnd = random.Random(10 + seed)
+    for _ in range(300):
+        matcher = KeywordMatcher(["".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(1, 3)))
+                                  for _ in range(rnd.randint(0, 5))])
+        texts = [random_text(rnd, 20) for _ in range(rnd.randint(0, 8))]
+        expected = np.array([[word in text for word in matcher.words] for text in texts], dtype=bool)
+        np.testing.assert_array_equal(matcher.hits_matrix(texts), expected.reshape(len(texts), len(matcher.words)))
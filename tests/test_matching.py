@@ -0,0 +1,58 @@
+import math
+
+import pandas as pd
+import pytest
+
+from src.matching import CandidateViews, challenge_type
+from src.snapshotStore import MatchingSnapshot
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("idea", "idea"), ("Ideas", "idea"), ("campaign", "campaign"), ("CAMPAIGNS", "campaign"),
+    ("both", "both"), ("", "both"), (None, "both"), (float("nan"), "both"), (3, "both"),
+])
+def test_challenge_type(value, expected):
+    assert challenge_type({"type": value}) == expected
+
+
+def test_challenge_type_missing_field():
+    assert challenge_type({}) == "both"
+
+
+def _frames():
+    ideas = pd.DataFrame([{"id": "i1", "title": "Solar bike"}])
+    campaigns = pd.DataFrame([{"id": "c1", "title": "Clean river"}])
+    # Type null upstream jadi None / NaN di DataFrame
+    challenges = pd.DataFrame([{"id": "h1", "type": None}, {"id": "h2", "type": "idea"}, {"id": "h3", "type": math.nan}])
+    return ideas, campaigns, challenges
+
+
+def test_memory_report_with_null_types():
+    ideas, campaigns, challenges = _frames()
+    report = CandidateViews(ideas, campaigns).memory_report(challenges)
+    assert report["per_run_copy_bytes_avoided"] == 2 * report["both_bytes"] + report["idea_bytes"]
+
+
+class _Engine:
+    version = "v1"
+
+
+def test_snapshot_with_null_types_builds_and_describes():
+    ideas, campaigns, challenges = _frames()
+    snapshot = MatchingSnapshot(("I", "C", "H"), ideas, campaigns, challenges, text_index=None,
+                                engine=_Engine(), built_at=0.0, build_seconds=0.0)
+    description = snapshot.describe()
+    assert description["challenges"] == 3
+    assert "per_run_copy_bytes_avoided" in description["candidateMemory"]
+
+
+def test_snapshot_describe_survives_memory_report_failure(monkeypatch):
+    ideas, campaigns, challenges = _frames()
+    snapshot = MatchingSnapshot(("I", "C", "H"), ideas, campaigns, challenges, text_index=None,
+                                engine=_Engine(), built_at=0.0, build_seconds=0.0)
+
+    def broken(self, challenges=None):
+        raise ValueError("broken")
+
+    monkeypatch.setattr(CandidateViews, "memory_report", broken)
+    assert snapshot.describe()["candidateMemory"] == {}
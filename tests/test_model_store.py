@@ -0,0 +1,77 @@
+import random
+
+import numpy as np
+
+from src import modelStore
+from src.modelStore import latest_version, load_engine, save_engine
+from src.similarity import SimilarityEngine
+
+WORDS = ["solar", "bike", "river", "clean", "water", "school", "food", "waste"]
+
+
+def _corpus(rnd: random.Random, n_docs: int = 12) -> dict:
+    return {f"d{i}": " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(1, 6))) for i in range(n_docs)}
+
+
+def _assert_same_engine(loaded: SimilarityEngine, engine: SimilarityEngine):
+    assert loaded.fitted
+    assert loaded.ids == engine.ids
+    assert loaded.index == engine.index
+    assert loaded.fingerprints == engine.fingerprints
+    assert loaded.n_docs == engine.n_docs
+    assert loaded.delta_since_fit == engine.delta_since_fit
+    assert loaded.vectorizer.vocabulary_ == engine.vectorizer.vocabulary_
+    assert loaded.vectorizer.max_features == engine.vectorizer.max_features
+    np.testing.assert_array_equal(loaded.df, engine.df)
+    np.testing.assert_array_equal(loaded.idf, engine.idf)
+    np.testing.assert_array_equal(loaded.counts.toarray(), engine.counts.toarray())
+    np.testing.assert_array_equal(loaded.matrix.toarray(), engine.matrix.toarray())
+
+
+def test_save_load_round_trip(tmp_path):
+    rnd = random.Random(0)
+    corpus = _corpus(rnd)
+    engine = SimilarityEngine()
+    engine.fit(list(corpus.values()), ids=list(corpus))
+
+    save_engine(engine, "v1", str(tmp_path))
+    loaded = load_engine("v1", str(tmp_path))
+
+    assert latest_version(str(tmp_path)) == "v1"
+    assert loaded.version == "v1"
+    _assert_same_engine(loaded, engine)
+    np.testing.assert_allclose(loaded.transform(["solar bike"]).toarray(), engine.transform(["solar bike"]).toarray())
+
+
+def test_round_trip_after_update_keeps_delta(tmp_path, monkeypatch):
+    # Engine hasil load harus bisa di-update lanjut, sama seperti engine aslinya
+    monkeypatch.setattr(modelStore, "IDF_DRIFT_THRESHOLD", 0.1)
+    rnd = random.Random(1)
+    corpus = _corpus(rnd)
+    engine = SimilarityEngine(drift_threshold=0.1)
+    engine.fit(list(corpus.values()), ids=list(corpus))
+    del corpus["d3"]
+    corpus["d0"] = "clean river water"
+    corpus["n1"] = "food waste school"
+    engine.update(list(corpus.values()), list(corpus))
+
+    save_engine(engine, "v2", str(tmp_path))
+    loaded = load_engine("v2", str(tmp_path))
+    _assert_same_engine(loaded, engine)
+    assert loaded.delta_since_fit == 3
+
+    corpus["n2"] = "solar bike"
+    expected = engine.copy()
+    expected.update(list(corpus.values()), list(corpus))
+    loaded.update(list(corpus.values()), list(corpus))
+    _assert_same_engine(loaded, expected)
+
+
+def test_load_missing_or_corrupt_version(tmp_path):
+    assert load_engine("nope", str(tmp_path)) is None
+
+    engine = SimilarityEngine()
+    engine.fit(["solar bike", "clean river"], ids=["a", "b"])
+    save_engine(engine, "v1", str(tmp_path))
+    (tmp_path / "v1.npz").write_bytes(b"broken")
+    assert load_engine("v1", str(tmp_path)) is None
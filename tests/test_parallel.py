@@ -0,0 +1,76 @@
+import multiprocessing.pool
+import os
+
+import pytest
+
+from src import parallel
+from src.parallel import imap_challenges, map_challenges
+
+pytestmark = pytest.mark.skipif(not parallel.fork_available(), reason="fork start method not available")
+
+
+@pytest.fixture(autouse=True)
+def cpus(monkeypatch):
+    # Worker dibatasi ke jumlah CPU; paksa pool walaupun mesin test punya satu CPU
+    monkeypatch.setattr(parallel.os, "cpu_count", lambda: 4)
+
+
+def test_map_matches_serial_with_closure():
+    offset = 7
+    items = list(range(50))
+
+    assert map_challenges(lambda item: (item + offset, os.getpid()), items, workers=1) == \
+        [(item + offset, os.getpid()) for item in items]
+    results = map_challenges(lambda item: (item + offset, os.getpid()), items, workers=3)
+
+    assert [value for value, _ in results] == [item + offset for item in items]
+    assert os.getpid() not in {pid for _, pid in results}
+    assert parallel._shared == {}
+
+
+def test_respawned_workers_see_shared_state(monkeypatch):
+    # maxtasksperchild=1: pool fork ulang worker setelah setiap chunk
+    class RespawningPool(multiprocessing.pool.Pool):
+        def __init__(self, processes=None, initializer=None, initargs=(), maxtasksperchild=None, context=None):
+            super().__init__(processes, initializer, initargs, 1, context)
+
+    monkeypatch.setattr(multiprocessing.pool, "Pool", RespawningPool)
+    items = list(range(40))
+
+    results = map_challenges(lambda item: (item * 2, os.getpid()), items, workers=2)
+
+    assert [value for value, _ in results] == [item * 2 for item in items]
+    assert len({pid for _, pid in results}) > 2
+    assert parallel._shared == {}
+
+
+def test_state_is_cleared_when_consumer_stops_early():
+    results = imap_challenges(lambda item: item, list(range(100)), workers=2)
+    assert next(results) == 0
+    assert len(parallel._shared) == 1
+
+    results.close()
+    assert parallel._shared == {}
+
+
+def test_state_is_cleared_when_worker_fails():
+    def fail_on_five(item):
+        if item == 5:
+            raise ValueError("bad challenge")
+        return item
+
+    with pytest.raises(ValueError, match="bad challenge"):
+        map_challenges(fail_on_five, list(range(20)), workers=2)
+    assert parallel._shared == {}
+
+
+def test_concurrent_calls_keep_separate_state():
+    first = imap_challenges(lambda item: item, list(range(10)), workers=2)
+    second = imap_challenges(lambda item: -item, list(range(10)), workers=2)
+
+    # Dua pool hidup bersamaan, masing-masing dengan state sendiri
+    assert [(next(first), next(second)) for _ in range(5)] == [(i, -i) for i in range(5)]
+    assert len(parallel._shared) == 2
+    assert list(first) == list(range(5, 10))
+    assert list(second) == [-i for i in range(5, 10)]
+    assert parallel._shared == {}
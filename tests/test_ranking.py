@@ -0,0 +1,95 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.matching import MatchRequest
+from src.ranking import (ENGAGEMENT_NORMALIZERS, TopK, combine_scores_array, combine_scores_improved,
+                         top_k_indices, validate_weights)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_top_k_indices_matches_stable_sort(seed):
+    rnd = random.Random(seed)
+    for _ in range(500):
+        n = rnd.randint(0, 30)
+        # Sedikit nilai berbeda supaya sering tie, plus NaN
+        scores = np.array([rnd.choice([0.1, 0.5, 0.5, 0.9, 1.0, float("nan")]) for _ in range(n)])
+        k = rnd.randint(0, n + 3)
+        expected = sorted(range(n), key=lambda i: (-np.nan_to_num(scores[i], nan=-np.inf), i))[:k]
+        assert top_k_indices(scores, k).tolist() == expected
+
+        # Sama dengan TopK streaming yang dulu dipakai match_challenge
+        heap = TopK(k)
+        for i, score in enumerate(scores):
+            heap.push(score, i)
+        assert heap.items() == expected
+
+
+WEIGHTS = [(0.5, 0.3, 0.2), (1.0, 0.0, 0.0), (0.2, 0.2, 0.6), (0.334, 0.333, 0.333), (0.1, 0.7, 0.2)]
+
+
+def _random_inputs(rnd: random.Random, n: int):
+    rule = np.array([rnd.random() for _ in range(n)])
+    sim = np.array([rnd.random() for _ in range(n)])
+    # Engagement di sekitar batas cap 100, termasuk 0 dan nilai besar
+    eng = np.array([rnd.choice([0.0, 1.0, 99.0, 100.0, 250.0, rnd.uniform(0, 150)]) for _ in range(n)])
+    return rule, sim, eng
+
+
+@pytest.mark.parametrize("weights", WEIGHTS)
+@pytest.mark.parametrize("seed", range(3))
+def test_combine_scores_array_matches_scalar(seed, weights):
+    rnd = random.Random(seed)
+    rule, sim, eng = _random_inputs(rnd, 200)
+
+    expected = [combine_scores_improved(r, s, e, *weights) for r, s, e in zip(rule, sim, eng)]
+    np.testing.assert_array_equal(combine_scores_array(rule, sim, eng, *weights), expected)
+    np.testing.assert_array_equal(combine_scores_array(rule, sim, eng, *weights, normalizer="linear"), expected)
+
+    # Tanpa engagement = engagement 0
+    expected_no_eng = [combine_scores_improved(r, s, 0.0, *weights) for r, s in zip(rule, sim)]
+    np.testing.assert_array_equal(combine_scores_array(rule, sim, None, *weights), expected_no_eng)
+
+
+@pytest.mark.parametrize("normalizer", ["log", lambda e: np.minimum(np.sqrt(e) / 10.0, 1.0)])
+@pytest.mark.parametrize("weights", WEIGHTS)
+def test_combine_scores_array_custom_normalizer(weights, normalizer):
+    rnd = random.Random(7)
+    rule, sim, eng = _random_inputs(rnd, 200)
+    normalize = ENGAGEMENT_NORMALIZERS[normalizer] if isinstance(normalizer, str) else normalizer
+
+    # Scalar version dengan engagement yang sudah dinormalisasi (x100 supaya lolos normalisasi linear)
+    expected = [combine_scores_improved(r, s, 100.0 * n, *weights) for r, s, n in zip(rule, sim, normalize(eng))]
+    np.testing.assert_allclose(combine_scores_array(rule, sim, eng, *weights, normalizer=normalizer), expected,
+                               rtol=0, atol=1e-12)
+
+
+def test_combine_scores_array_broadcasts_across_challenges():
+    rnd = random.Random(3)
+    rule, sim, eng = _random_inputs(rnd, 12)
+    rule, sim, eng = rule.reshape(3, 4), sim.reshape(3, 4), eng.reshape(3, 4)
+
+    combined = combine_scores_array(rule, sim, eng)
+
+    assert combined.shape == (3, 4)
+    for row in range(3):
+        np.testing.assert_array_equal(combined[row], combine_scores_array(rule[row], sim[row], eng[row]))
+
+
+@pytest.mark.parametrize("weights", [(0.5, 0.5, 0.5), (0.0, 0.0, 0.0), (0.5, 0.3, 0.1), (0.6, 0.3, 0.12)])
+def test_bad_weights_are_rejected(weights):
+    with pytest.raises(ValueError):
+        validate_weights(*weights)
+    with pytest.raises(ValueError):
+        combine_scores_array([0.5], [0.5], [1.0], *weights)
+    with pytest.raises(ValueError):
+        combine_scores_improved(0.5, 0.5, 1.0, *weights)
+    with pytest.raises(ValueError):
+        MatchRequest(weights=weights)
+
+
+@pytest.mark.parametrize("weights", WEIGHTS + [(0.5, 0.3, 0.205), (0.5, 0.3, 0.195)])
+def test_weights_within_tolerance_are_accepted(weights):
+    validate_weights(*weights)
+    assert MatchRequest(weights=weights).weights == weights
@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from src import getData, main
+from src.getData import RecommendationWriter
+from src.matching import flush_recommendations
+
+
+class FakeTable:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+
+    def upsert(self, rows, **kwargs):
+        if self.name in self.db.failing:
+            raise RuntimeError(f"{self.name} unavailable")
+        self.db.upserts.append((self.name, len(rows)))
+        return self
+
+    def execute(self):
+        return self
+
+
+class FakeSupabase:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.upserts = []
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+
+def _fill(writer, n_ideas=5, n_campaigns=1):
+    for i in range(n_ideas):
+        writer.add_idea("h1", f"i{i}", 0.5, 0.4, 0.3)
+    for i in range(n_campaigns):
+        writer.add_campaign("h1", f"c{i}", 0.5, 0.4, 0.3)
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_rows_are_written_in_batches(monkeypatch, background):
+    db = FakeSupabase()
+    monkeypatch.setattr(getData, "supabase", db)
+    writer = RecommendationWriter(batch_size=2, background=background)
+    _fill(writer)
+
+    stats = writer.flush()
+
+    assert stats == {"saved": 6, "failed": 0, "batches": 4, "failed_batches": 0}
+    assert sorted(db.upserts) == sorted([("idea_recommendations", 2), ("idea_recommendations", 2),
+                                         ("idea_recommendations", 1), ("campaign_recommendations", 1)])
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_failed_batches_are_counted(monkeypatch, background):
+    monkeypatch.setattr(getData, "supabase", FakeSupabase(failing={"idea_recommendations"}))
+    writer = RecommendationWriter(batch_size=2, background=background)
+    _fill(writer)
+
+    summary = flush_recommendations(writer)
+
+    assert writer.stats == {"saved": 1, "failed": 5, "batches": 4, "failed_batches": 3}
+    assert summary["recommendations_saved"] == 1
+    assert summary["recommendations_failed"] == 5
+    assert [error["rows"] for error in summary["errors"]] == [2, 2, 1]
+
+
+def test_missing_ids_are_rejected(monkeypatch):
+    monkeypatch.setattr(getData, "supabase", FakeSupabase())
+    writer = RecommendationWriter(batch_size=2, background=False)
+    assert not writer.add_idea("h1", None)
+    assert writer.flush()["saved"] == 0
+
+
+def test_flush_without_writer():
+    assert flush_recommendations(None) == {"recommendations_saved": "not_saved"}
+
+
+def test_buffered_rows_are_written_when_matching_fails(monkeypatch):
+    db = FakeSupabase()
+    monkeypatch.setattr(getData, "supabase", db)
+    snapshot = SimpleNamespace(challenges=pd.DataFrame([{"id": "h1"}]), engine=SimpleNamespace(version="v1"),
+                               ideas=pd.DataFrame(), campaigns=pd.DataFrame(), views=None, text_index=None,
+                               index_cache={})
+    monkeypatch.setattr(main, "build_snapshot", lambda *args, **kwargs: snapshot)
+
+    def failing_match(request, challenges, views, engine, text_index=None, index_cache=None, writer=None):
+        writer.add_idea("h1", "i1", 0.5, 0.4, 0.3)
+        raise RuntimeError("matching failed")
+
+    monkeypatch.setattr(main, "match_challenges", failing_match)
+    with pytest.raises(RuntimeError, match="matching failed"):
+        main.process_recommendations_optimized(save_to_db=True)
+    assert db.upserts == [("idea_recommendations", 1)]
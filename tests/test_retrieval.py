@@ -0,0 +1,111 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import retrieval
+from src.retrieval import RetrievalIndex, shortlist_candidates
+from src.similarity import SimilarityEngine
+
+# Vocabulary kecil + dokumen duplikat supaya sering tie
+WORDS = ["solar", "bike", "river", "clean", "water", "school", "food", "waste"]
+
+
+def random_text(rnd: random.Random) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(0, 5)))
+
+
+def _engine(rnd: random.Random, n_docs: int):
+    texts = [random_text(rnd) for _ in range(n_docs)]
+    texts += [rnd.choice(texts) for _ in range(n_docs // 2)]
+    ids = [f"d{i}" for i in range(len(texts))]
+    engine = SimilarityEngine()
+    engine.fit(texts + [" ".join(WORDS)], ids=ids + ["anchor"])
+    return engine, ids
+
+
+def brute_force_top_k(engine, ids, query, k):
+    """Dot product ke semua dokumen, urut skor desc lalu posisi asc; id yang tidak dikenal skor 0."""
+    rows = engine.rows(ids)
+    scores = np.zeros(len(ids))
+    known = rows >= 0
+    if known.any():
+        scores[known] = (engine.matrix[rows[known]] @ query.T).toarray().ravel()
+    rounded = np.round(scores, 9)
+    order = np.lexsort((np.arange(len(ids)), -rounded))[:max(k, 0)]
+    return order, scores[order]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_top_k_matches_brute_force(seed):
+    rnd = random.Random(seed)
+    engine, ids = _engine(rnd, rnd.randint(1, 40))
+    for _ in range(30):
+        # Subset acak (urutan diacak) plus id yang tidak ada di engine
+        subset = rnd.sample(ids, rnd.randint(0, len(ids))) + [f"missing{i}" for i in range(rnd.randint(0, 3))]
+        rnd.shuffle(subset)
+        index = RetrievalIndex(engine, subset)
+        for _ in range(5):
+            query = engine.transform([random_text(rnd)])
+            k = rnd.randint(0, len(subset) + 3)
+
+            positions, scores = index.top_k(query, k)
+            expected_positions, expected_scores = brute_force_top_k(engine, subset, query, k)
+
+            assert len(positions) == min(k, len(subset))
+            np.testing.assert_allclose(scores, expected_scores, atol=1e-9)
+            np.testing.assert_array_equal(positions, expected_positions)
+
+
+def test_top_k_ties_are_broken_by_position():
+    engine = SimilarityEngine()
+    engine.fit(["solar bike", "clean river", "solar bike", "solar bike", "clean river"], ids=list("abcde"))
+    index = RetrievalIndex(engine, list("edcba"))
+
+    positions, scores = index.top_k(engine.transform(["solar bike"]), 4)
+
+    # "solar bike" ada di posisi 1 (d), 2 (c), 4 (a) dengan skor sama; sisanya pad skor 0 dari posisi terkecil
+    assert positions.tolist() == [1, 2, 4, 0]
+    np.testing.assert_allclose(scores, [1.0, 1.0, 1.0, 0.0])
+
+
+def test_top_k_with_k_larger_than_index():
+    engine = SimilarityEngine()
+    engine.fit(["solar bike", "clean river"], ids=["a", "b"])
+    index = RetrievalIndex(engine, ["b", "x", "a"])
+
+    positions, scores = index.top_k(engine.transform(["river"]), 10)
+
+    assert positions.tolist() == [0, 1, 2]
+    assert scores[0] > 0 and scores[1:].tolist() == [0.0, 0.0]
+
+
+def test_shortlist_reuses_index_per_frame(monkeypatch):
+    engine = SimilarityEngine()
+    texts = ["solar bike", "clean river", "food waste", "school water", "solar river"]
+    ids = list("abcde")
+    engine.fit(texts, ids=ids)
+    engine.version = "v1"
+    frame = pd.DataFrame({"id": ids})
+
+    built = []
+
+    class CountingIndex(RetrievalIndex):
+        def __init__(self, engine, ids):
+            built.append(list(ids))
+            super().__init__(engine, ids)
+
+    monkeypatch.setattr(retrieval, "RetrievalIndex", CountingIndex)
+    cache = {}
+    first = shortlist_candidates(frame, engine, "a", k=2, index_cache=cache)
+    second = shortlist_candidates(frame, engine, "b", k=2, index_cache=cache)
+    assert len(built) == 1
+    assert first["id"].tolist() == ["a", "e"]
+    assert second["id"].tolist() == ["b", "e"]
+
+    # Frame lain (walaupun id sama) dan engine version baru -> index baru
+    shortlist_candidates(frame.copy(), engine, "a", k=2, index_cache=cache)
+    engine.version = "v2"
+    shortlist_candidates(frame, engine, "a", k=2, index_cache=cache)
+    assert len(built) == 3
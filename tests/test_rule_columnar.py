@@ -0,0 +1,142 @@
+"""
+Fuzz: evaluasi columnar (ConditionPlan.evaluate_frame) vs check per row (ConditionPlan.evaluate)
+pada DataFrame acak: kolom campuran, NaN / None, kolom numeric dan nullable dtype.
+"""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import ruledBased as rb
+from src.textIndex import build_text_index
+
+NUMERIC_VALUES = [0, 1, 5, 10, "10", "abc", None, float("nan"), 2.5, True, "  7 ", "nan"]
+TEXT_VALUES = ["Solar Water", "", None, float("nan"), "ab c", "clean river", 5]
+TAG_VALUES = [["solar", "x"], "solar,x", None, [], ["river", "Ab"]]
+WORDS = ["sol", "Solar", " ", "", None, "Wat", "ab c", "x", "river", 5]
+
+
+def random_frame(rnd: random.Random) -> pd.DataFrame:
+    n = rnd.randint(0, 12)
+    columns = rnd.sample(["votes", "Votes", "supports", "comments", "title", "description", "tags",
+                          "category", "name"], rnd.randint(0, 7))
+    rows = []
+    for i in range(n):
+        row = {"id": f"c{i}"}
+        for column in columns:
+            if rnd.random() < 0.15:
+                continue
+            if column == "tags":
+                row[column] = rnd.choice(TAG_VALUES)
+            elif column in ("title", "description", "category", "name"):
+                row[column] = rnd.choice(TEXT_VALUES)
+            else:
+                row[column] = rnd.choice(NUMERIC_VALUES)
+        rows.append(row)
+    df = pd.DataFrame(rows)
+    # Kolom numeric seperti hasil preprocessing (float / nullable Float64)
+    for column in ("votes", "supports"):
+        if column in df.columns and rnd.random() < 0.4:
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+            if rnd.random() < 0.5:
+                df[column] = df[column].astype("Float64")
+    return df
+
+
+def random_condition(rnd: random.Random) -> dict:
+    kind = rnd.choice(["numeric", "numeric", "words", "words", "field", None])
+    condition = {"kind": kind}
+    if kind == "words":
+        condition["words"] = rnd.sample(WORDS, rnd.randint(0, 3))
+        condition["operator"] = rnd.choice(["any", "all", None])
+        return condition
+    condition["field"] = rnd.choice(["votes", "VOTES", "supports", "feedbacks", "title", "category",
+                                     "description", "missing", None])
+    condition["operator"] = rnd.choice([">=", ">", "<", "<=", "=", "==", "!=", "contains", "bad", None])
+    condition["value"] = rnd.choice([0, 5, "10", 2.5, "abc", None, "solar", "river"])
+    return condition
+
+
+def row_results(plan: rb.ConditionPlan, df: pd.DataFrame) -> np.ndarray:
+    rows = [[bool(passed) for passed in plan.evaluate(record)] for record in df.to_dict("records")]
+    return np.array(rows, dtype=bool).T.reshape(len(plan), len(df))
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_columnar_matches_row_evaluation(seed):
+    rnd = random.Random(seed)
+    for _ in range(300):
+        df = random_frame(rnd)
+        conditions = [random_condition(rnd) for _ in range(rnd.randint(1, 4))]
+        plan = rb.compile_conditions(conditions, list(df.columns))
+        expected = row_results(plan, df)
+        np.testing.assert_array_equal(plan.evaluate_frame(df), expected, err_msg=str(conditions))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_columnar_with_text_index_matches_row_evaluation(seed):
+    rnd = random.Random(50 + seed)
+    for _ in range(200):
+        df = random_frame(rnd)
+        conditions = [{"kind": "words", "words": rnd.sample(WORDS, rnd.randint(1, 3)),
+                       "operator": rnd.choice(["any", "all"])} for _ in range(rnd.randint(1, 3))]
+        plan = rb.compile_conditions(conditions, list(df.columns))
+        expected = row_results(plan, df)
+        text_index = build_text_index(df)
+        np.testing.assert_array_equal(plan.evaluate_frame(df, text_index), expected, err_msg=str(conditions))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_rule_based_match_is_independent_of_evaluation_path(seed, monkeypatch):
+    rnd = random.Random(200 + seed)
+    cases = []
+    for _ in range(100):
+        df = random_frame(rnd)
+        if "title" in df.columns:
+            # Title selalu string setelah preprocessing (result memakai title[:50])
+            df["title"] = [v if isinstance(v, str) else "" for v in df["title"].tolist()]
+        challenge = {"id": "h", "conditions": [random_condition(rnd) for _ in range(rnd.randint(1, 3))]}
+        cases.append((challenge, df, rb.rule_based_match_improved(challenge, df)))
+
+    # Semua condition lewat check per row
+    monkeypatch.setattr(rb, "compile_condition_columnar", lambda *args, **kwargs: None)
+    for challenge, df, columnar in cases:
+        rows = rb.rule_based_match_improved(challenge, df)
+        assert [(r["id"], r["passed_conditions"], r["score"]) for r in columnar] == \
+               [(r["id"], r["passed_conditions"], r["score"]) for r in rows], challenge
+
+
+def test_plan_compiles_columnar_checks_once(monkeypatch):
+    calls = []
+    compile_columnar = rb.compile_condition_columnar
+
+    def counting(condition, columns, matcher=None):
+        calls.append(condition["kind"])
+        return compile_columnar(condition, columns, matcher)
+
+    monkeypatch.setattr(rb, "compile_condition_columnar", counting)
+    df = pd.DataFrame({"id": ["a", "b"], "title": ["Solar bike", ""], "votes": [3, 12]})
+    conditions = [{"kind": "numeric", "field": "votes", "operator": ">=", "value": 5},
+                  {"kind": "words", "words": ["solar"], "operator": "any"}]
+    plan = rb.compile_conditions(conditions, df.columns)
+    assert calls == ["numeric", "words"]
+
+    for _ in range(3):
+        np.testing.assert_array_equal(plan.evaluate_frame(df), [[False, True], [True, False]])
+    assert len(calls) == 2
+
+    # Schema lain -> compile ulang sekali
+    other = df[["id", "votes", "title"]]
+    plan.evaluate_frame(other)
+    plan.evaluate_frame(other)
+    assert len(calls) == 4
+
+
+def test_nonempty_text_mask_is_cached():
+    df = pd.DataFrame({"id": ["a", "b", "c"], "title": ["Solar", None, ""], "tags": [[], ["river"], None]})
+    cols = rb.CandidateColumns(df)
+    mask = cols.nonempty_text()
+
+    np.testing.assert_array_equal(mask, [len(text) > 0 for text in cols.text_lower()])
+    assert cols.nonempty_text() is mask
@@ -0,0 +1,133 @@
+"""
+Fuzz: compiled conditions (compile_condition / ConditionPlan) vs evaluator per row yang lama.
+reference_evaluate adalah evaluate_condition sebelum compile step (tanpa print).
+"""
+import random
+
+import pytest
+
+from src import ruledBased as rb
+
+ALIASES = {
+    "supervotes": ["superVotes", "supervotes", "super_vote", "super_vote_count"],
+    "votes": ["votes", "vote", "voters"],
+    "feedbacks": ["feedbacks", "comments", "responses"],
+    "supports": ["supports", "support", "supporters"],
+    "title": ["title", "name"],
+    "description": ["description", "desc", "content"],
+}
+
+
+def reference_value(candidate, field):
+    if field in candidate:
+        return candidate[field]
+    lower_map = {k.lower(): k for k in candidate.keys()}
+    if field.lower() in lower_map:
+        return candidate[lower_map[field.lower()]]
+    for canon, keys in ALIASES.items():
+        if field.lower() == canon:
+            for k in keys:
+                if k in candidate:
+                    return candidate[k]
+                if k.lower() in lower_map:
+                    return candidate[lower_map[k.lower()]]
+    return 0
+
+
+def reference_evaluate(condition, candidate) -> bool:
+    try:
+        kind = condition.get("kind")
+        if kind == "numeric":
+            field, op_str = condition.get("field"), condition.get("operator")
+            if not op_str or not field or op_str not in rb.OPS:
+                return False
+            value = reference_value(candidate, field)
+            try:
+                candidate_num = float(value) if value is not None else 0
+                target_num = float(condition.get("value", 0))
+            except (ValueError, TypeError):
+                return False
+            return rb.OPS[op_str](candidate_num, target_num)
+        if kind == "words":
+            words = condition.get("words", [])
+            if not words:
+                return False
+            parts = [str(candidate[k]) for k in ("title", "description") if candidate.get(k, "")]
+            tags = candidate.get("tags", [])
+            if isinstance(tags, list):
+                parts.extend(str(tag) for tag in tags)
+            elif isinstance(tags, str):
+                parts.append(tags)
+            text = " ".join(parts)
+            if not text:
+                return False
+            text = text.lower()
+            words = [w for w in (str(w).lower().strip() for w in words if w) if w]
+            if condition.get("operator", "any") == "all":
+                return all(w in text for w in words)
+            return any(w in text for w in words)
+        if kind == "field":
+            field = condition.get("field")
+            op_func = rb.OPS.get(condition.get("operator", "="))
+            if not field or not op_func:
+                return False
+            value = reference_value(candidate, field)
+            return op_func(str(value).lower(), str(condition.get("value")).lower())
+        return False
+    except Exception:
+        return False
+
+
+VALUES = [0, 1, 5, 10, "10", "abc", None, float("nan"), 2.5, True, [1], "  7 ", "nan"]
+WORDS = ["sol", "Solar", " ", "", None, "Wat", "ab c", "x", 5]
+FIELDS = ["votes", "Votes", "superVotes", "comments", "supports", "title", "description", "tags",
+          "category", "name", "content"]
+
+
+def random_candidate(rnd: random.Random) -> dict:
+    candidate = {"id": "x"}
+    for key in rnd.sample(FIELDS, rnd.randint(0, 8)):
+        if key == "tags":
+            candidate[key] = rnd.choice([["solar", "x"], "solar,x", None, [], [1, 2]])
+        elif key in ("title", "description", "name", "content", "category"):
+            candidate[key] = rnd.choice(["Solar Water", "", None, float("nan"), "ab c", 5])
+        else:
+            candidate[key] = rnd.choice(VALUES)
+    return candidate
+
+
+def random_condition(rnd: random.Random) -> dict:
+    condition = {"kind": rnd.choice(["numeric", "words", "field", "zzz", None])}
+    if rnd.random() < 0.9:
+        condition["field"] = rnd.choice(["votes", "VOTES", "supervotes", "feedbacks", "title", "description",
+                                         "missing", None, ""])
+    if rnd.random() < 0.9:
+        condition["operator"] = rnd.choice([">=", ">", "<", "<=", "=", "==", "!=", "contains", "bad", None,
+                                            "any", "all"])
+    if rnd.random() < 0.9:
+        condition["value"] = rnd.choice(VALUES + ["solar"])
+    if rnd.random() < 0.9:
+        condition["words"] = rnd.sample(WORDS, rnd.randint(0, 3))
+    return condition
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_compiled_condition_matches_reference(seed):
+    rnd = random.Random(seed)
+    for _ in range(2000):
+        candidate, condition = random_candidate(rnd), random_condition(rnd)
+        expected = bool(reference_evaluate(condition, candidate))
+        assert bool(rb.evaluate_condition(condition, candidate)) == expected, (condition, candidate)
+        # Dengan columns: field di-resolve saat compile
+        assert bool(rb.compile_condition(condition, list(candidate))(candidate)) == expected, (condition, candidate)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_condition_plan_matches_reference(seed):
+    rnd = random.Random(100 + seed)
+    for _ in range(300):
+        candidate = random_candidate(rnd)
+        conditions = [random_condition(rnd) for _ in range(rnd.randint(0, 4))]
+        plan = rb.compile_conditions(conditions, list(candidate))
+        expected = [bool(reference_evaluate(condition, candidate)) for condition in conditions]
+        assert [bool(passed) for passed in plan.evaluate(candidate)] == expected, (conditions, candidate)
@@ -0,0 +1,159 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.ruledBased import filter_by_similarity
+from src.similarity import SimilarityEngine
+
+WORDS = ["solar", "bike", "river", "clean", "water", "school", "food", "waste", "tree", "city"]
+
+
+def random_text(rnd: random.Random, words=WORDS) -> str:
+    return " ".join(rnd.choice(words) for _ in range(rnd.randint(0, 8)))
+
+
+def fitted_engine(rnd: random.Random, n_docs: int = 20) -> SimilarityEngine:
+    engine = SimilarityEngine()
+    engine.fit([random_text(rnd) for _ in range(n_docs)] + [" ".join(WORDS)])
+    return engine
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_compute_many_matches_pairwise_compute(seed):
+    rnd = random.Random(seed)
+    engine = fitted_engine(rnd)
+    for _ in range(50):
+        # "unknown" di luar vocabulary -> text kosong / semua OOV dapat skor 0
+        text = random_text(rnd, WORDS + ["unknown"])
+        texts = [random_text(rnd, WORDS + ["unknown"]) for _ in range(rnd.randint(0, 10))]
+        expected = [engine.compute(text, other) for other in texts]
+        np.testing.assert_allclose(engine.compute_many(text, texts), expected, atol=1e-12)
+
+
+def test_filter_by_similarity_uses_batch_scores():
+    engine = fitted_engine(random.Random(0))
+    matches = [
+        {"id": "a", "raw": {"title": "solar bike", "description": "", "tags": ["city"]}},
+        {"id": "b", "raw": {"title": "food waste", "description": "school"}},
+        {"id": "c", "raw": {"title": "solar", "description": "river", "tags": []}},
+    ]
+    expected = {m["id"]: engine.compute("solar bike city", " ".join([
+        m["raw"]["title"], m["raw"]["description"], " ".join(m["raw"].get("tags", []))
+    ])) for m in matches}
+
+    filtered = filter_by_similarity(matches, "solar bike city", engine, min_similarity=0.1)
+
+    assert [m["id"] for m in filtered] == [i for i in ("a", "b", "c") if expected[i] >= 0.1]
+    for match in filtered:
+        assert match["similarity_score"] == pytest.approx(expected[match["id"]])
+
+
+def _stripped(text: str, vocabulary: dict) -> str:
+    """Text tanpa token di luar vocabulary: padanannya untuk fresh fit dengan vocabulary yang sama."""
+    return " ".join(token for token in text.split() if token in vocabulary)
+
+
+def _assert_same_as_fresh_fit(engine: SimilarityEngine, corpus: dict):
+    vocabulary = engine.vectorizer.vocabulary_
+    ids = list(corpus)
+    fresh = SimilarityEngine()
+    fresh.fit([_stripped(corpus[entity_id], vocabulary) for entity_id in ids], ids=ids)
+
+    assert fresh.vectorizer.vocabulary_ == vocabulary
+    assert sorted(engine.ids) == sorted(ids)
+    rows = engine.rows(ids)
+    assert engine.n_docs == fresh.n_docs == len(ids)
+    np.testing.assert_array_equal(engine.df, fresh.df)
+    np.testing.assert_allclose(engine.idf, fresh.idf)
+    np.testing.assert_array_equal(engine.counts[rows].toarray(), fresh.counts.toarray())
+    np.testing.assert_allclose(engine.matrix[rows].toarray(), fresh.matrix.toarray(), atol=1e-12)
+    for entity_id in ids:
+        np.testing.assert_allclose(engine.compute_ids(entity_id, ids), fresh.compute_ids(entity_id, ids), atol=1e-12)
+
+
+def _mutate(rnd: random.Random, corpus: dict, n_add: int, n_change: int, n_remove: int, words) -> dict:
+    # "anchor" memuat semua WORDS dan tidak pernah dihapus, jadi vocabulary fresh fit tetap sama
+    updated = dict(corpus)
+    mutable = [entity_id for entity_id in updated if entity_id != "anchor"]
+    rnd.shuffle(mutable)
+    for entity_id in mutable[:n_remove]:
+        del updated[entity_id]
+    for entity_id in mutable[n_remove:n_remove + n_change]:
+        updated[entity_id] = random_text(rnd, words)
+    for i in range(n_add):
+        updated[f"new{rnd.random()}-{i}"] = random_text(rnd, words)
+    return updated
+
+
+def _base_corpus(rnd: random.Random, n_docs: int = 15) -> dict:
+    corpus = {f"d{i}": random_text(rnd) for i in range(n_docs)}
+    corpus["anchor"] = " ".join(WORDS)
+    return corpus
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_update_matches_fresh_fit(seed):
+    rnd = random.Random(seed)
+    corpus = _base_corpus(rnd)
+    # drift_threshold=0 -> setiap perubahan IDF memicu re-normalization, jadi matrix harus identik
+    engine = SimilarityEngine(drift_threshold=0.0)
+    engine.fit(list(corpus.values()), ids=list(corpus))
+
+    for _ in range(4):
+        corpus = _mutate(rnd, corpus, rnd.randint(0, 4), rnd.randint(0, 4), rnd.randint(0, 4), WORDS + ["novel"])
+        stats = engine.update(list(corpus.values()), list(corpus))
+        _assert_same_as_fresh_fit(engine, corpus)
+        assert engine.index == {entity_id: row for row, entity_id in enumerate(engine.ids)}
+        assert set(engine.fingerprints) == set(corpus)
+        assert stats["added"] + stats["changed"] + stats["removed"] <= engine.delta_since_fit
+
+
+def test_update_removal_only():
+    rnd = random.Random(1)
+    corpus = _base_corpus(rnd)
+    engine = SimilarityEngine(drift_threshold=0.0)
+    engine.fit(list(corpus.values()), ids=list(corpus))
+
+    corpus = _mutate(rnd, corpus, n_add=0, n_change=0, n_remove=5, words=WORDS)
+    stats = engine.update(list(corpus.values()), list(corpus))
+
+    assert (stats["added"], stats["changed"], stats["removed"]) == (0, 0, 5)
+    assert stats["oov_share"] == 0.0
+    assert engine.delta_since_fit == 5
+    _assert_same_as_fresh_fit(engine, corpus)
+
+
+@pytest.mark.parametrize("drift_threshold", [0.0, 10.0])
+def test_update_all_oov(drift_threshold):
+    rnd = random.Random(2)
+    corpus = _base_corpus(rnd)
+    engine = SimilarityEngine(drift_threshold=drift_threshold)
+    engine.fit(list(corpus.values()), ids=list(corpus))
+
+    # Semua token delta di luar vocabulary -> row kosong, skor 0 terhadap semua dokumen
+    corpus["d0"] = "zebra quokka"
+    corpus["oov"] = "zebra zebra"
+    stats = engine.update(list(corpus.values()), list(corpus))
+
+    assert (stats["added"], stats["changed"]) == (1, 1)
+    assert stats["oov_share"] == 1.0
+    assert engine.counts[engine.index["oov"]].nnz == 0
+    assert not engine.compute_ids("oov", list(corpus)).any()
+    assert not engine.compute_ids("d0", list(corpus)).any()
+    if drift_threshold == 0.0:
+        _assert_same_as_fresh_fit(engine, corpus)
+
+
+def test_update_without_changes_is_noop():
+    rnd = random.Random(3)
+    corpus = _base_corpus(rnd)
+    engine = SimilarityEngine()
+    engine.fit(list(corpus.values()), ids=list(corpus))
+    matrix = engine.matrix
+
+    stats = engine.update(list(corpus.values()), list(corpus))
+
+    assert (stats["added"], stats["changed"], stats["removed"]) == (0, 0, 0)
+    assert engine.matrix is matrix
+    assert engine.delta_since_fit == 0
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+
+import pytest
+
+from src import snapshotStore
+from src.snapshotStore import SnapshotStore
+
+SOURCES = ("I", "C", "H")
+
+
+class _Snapshot:
+    def __init__(self, n):
+        self.n = n
+
+    def describe(self):
+        return {"n": self.n}
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+
+    def build_snapshot(*sources, force_rebuild=False, previous=None):
+        calls.append(sources)
+        return _Snapshot(len(calls))
+
+    monkeypatch.setattr(snapshotStore, "build_snapshot", build_snapshot)
+    return calls
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_schedule_refresh_is_rate_limited(builds):
+    store = SnapshotStore(refresh_interval=0, miss_refresh_interval=60)
+    first = store.get(*SOURCES)
+
+    assert store.schedule_refresh(*SOURCES)
+    assert _wait_for(lambda: store.current(*SOURCES) is not first)
+    # Miss berikutnya dalam interval tidak memicu ingestion lagi
+    assert not store.schedule_refresh(*SOURCES)
+    assert len(builds) == 2
+
+
+def test_schedule_refresh_needs_existing_snapshot(builds):
+    store = SnapshotStore(refresh_interval=0, miss_refresh_interval=0)
+    assert not store.schedule_refresh(*SOURCES)
+    assert builds == []
+
+
+def test_schedule_refresh_does_not_block_caller(monkeypatch):
+    release = threading.Event()
+
+    def slow_build(*sources, force_rebuild=False, previous=None):
+        if previous is not None:
+            release.wait(5)
+        return _Snapshot(0)
+
+    store = SnapshotStore(refresh_interval=0, miss_refresh_interval=0)
+    monkeypatch.setattr(snapshotStore, "build_snapshot", slow_build)
+    store.get(*SOURCES)
+
+    start = time.time()
+    assert store.schedule_refresh(*SOURCES)
+    assert time.time() - start < 0.5
+    # Build masih jalan -> tidak ada refresh kedua yang dijadwalkan
+    assert _wait_for(lambda: store._build_lock.locked())
+    assert not store.schedule_refresh(*SOURCES)
+    release.set()
+
+
+def test_refresh_loop_keeps_running(monkeypatch):
+    calls = []
+
+    def flaky_build(*sources, force_rebuild=False, previous=None):
+        calls.append(sources)
+        if previous is not None and len(calls) % 3 == 0:
+            raise RuntimeError("upstream down")
+        return _Snapshot(len(calls))
+
+    monkeypatch.setattr(snapshotStore, "build_snapshot", flaky_build)
+    store = SnapshotStore(refresh_interval=0.01, max_sources=2)
+    try:
+        store.get(*SOURCES)
+        store.get("I2", "C2", "H2")
+        # Build yang gagal tidak menghentikan thread refresher
+        assert _wait_for(lambda: len(calls) > 12)
+        assert store._thread.is_alive()
+        assert {sources for sources in calls} == {SOURCES, ("I2", "C2", "H2")}
+    finally:
+        store.stop()
+
+
+class _RacyDict(OrderedDict):
+    """Iterasi pertama gagal seperti dict yang diubah thread lain selagi di-list."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.failures = 1
+
+    def __iter__(self):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("OrderedDict mutated during iteration")
+        return super().__iter__()
+
+
+def test_refresh_loop_survives_concurrent_eviction(builds):
+    store = SnapshotStore(refresh_interval=0.01)
+    try:
+        store.get(*SOURCES)
+        store._snapshots = _RacyDict(store._snapshots)
+        assert _wait_for(lambda: len(builds) >= 3)
+        assert store._thread.is_alive()
+        assert store._snapshots.failures == 0
+    finally:
+        store.stop()
+
+
+def test_evicted_sources_are_not_rebuilt(builds):
+    store = SnapshotStore(refresh_interval=0, max_sources=1)
+    store.get(*SOURCES)
+    store.get("I2", "C2", "H2")
+    store.refresh_interval = 0.01
+    try:
+        store._ensure_refresher()
+        assert _wait_for(lambda: len(builds) >= 4)
+        assert SOURCES not in builds[2:]
+        assert list(store._snapshots) == [("I2", "C2", "H2")]
+    finally:
+        store.stop()